@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import time
+
+from typing import Any
+
+from jizzy.builder import Builder
+from jizzy.grammar import Grammar, GrammarMeta, NonTerminal, Rule, Terminal
+from jizzy.operators import Repeat
+
+
+def make_grammar(count: int) -> GrammarMeta:
+    # count statement forms "k<i> [name, ...] ;", each with a possibly
+    # empty comma separated argument list, so every statement adds a
+    # keyword, two nonterminals and three rules
+    attrs: dict[str, Any] = dict(
+        NAME=Terminal(pattern=r"[a-z]+"),
+        COMMA=Terminal(pattern=r","),
+        SEMICOLON=Terminal(pattern=r";"),
+        WHITESPACE=Terminal(pattern=r"\s+", skip=True),
+        PROGRAM=NonTerminal(),
+        STATEMENT=NonTerminal(),
+    )
+    for idx in range(count):
+        attrs[f"K{idx}"] = Terminal(pattern=f"k{idx}")
+        attrs[f"S{idx}"] = NonTerminal()
+        attrs[f"A{idx}"] = NonTerminal()
+
+    def rules(cls: GrammarMeta) -> list[Rule]:
+        builder: Any = cls.builder()
+        rules = [
+            Rule(
+                callback=builder.noop,
+                lhs=cls.PROGRAM,  # type: ignore
+                rhs=[Repeat(element=cls.STATEMENT, allow_empty=True)]  # type: ignore
+            )
+        ]
+        for idx in range(count):
+            statement = getattr(cls, f"S{idx}")
+            arguments = getattr(cls, f"A{idx}")
+            rules.extend([
+                Rule(callback=builder.noop, lhs=cls.STATEMENT, rhs=[statement]),  # type: ignore
+                Rule(
+                    callback=builder.noop,
+                    lhs=statement,
+                    rhs=[getattr(cls, f"K{idx}"), arguments, cls.SEMICOLON]  # type: ignore
+                ),
+                Rule(
+                    callback=builder.noop,
+                    lhs=arguments,
+                    rhs=[Repeat(element=cls.NAME, separator=cls.COMMA)]  # type: ignore
+                ),
+            ])
+        return rules
+
+    attrs.update(
+        builder=classmethod(lambda cls: Builder),
+        start=classmethod(lambda cls: cls.PROGRAM),
+        rules=classmethod(rules),
+    )
+    return GrammarMeta(f"Synthetic{count}", (Grammar,), attrs)
+
+
+def bench(count: int):
+    start = time.perf_counter()
+    grammar = make_grammar(count)
+    created = time.perf_counter()
+    grammar.finalize()
+    finalized = time.perf_counter()
+    grammar.first_sets()
+    first = time.perf_counter()
+    grammar.lalr_make_automaton()
+    built = time.perf_counter()
+
+    rules = len(grammar.rules())
+    print(
+        f"{count:>6} statements {rules:>6} rules {len(grammar.symbols()):>6} symbols "
+        f"create {(created - start) * 1e3:>8.1f} ms "
+        f"finalize {(finalized - created) * 1e3:>8.1f} ms "
+        f"first {(first - finalized) * 1e3:>8.1f} ms "
+        f"automaton {(built - first) * 1e3:>9.1f} ms "
+        f"({(built - start) / rules * 1e6:>6.1f} us/rule)"
+    )
+
+    text = " ".join(f"k{idx} a, b;" for idx in range(0, count, max(count // 10, 1)))
+    assert grammar.parse(text) is not None
+
+
+if __name__ == "__main__":
+    for count in (250, 500, 1000, 2000):
+        bench(count)
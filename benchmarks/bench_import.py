@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import sys
+import subprocess
+
+
+def import_time(statement: str) -> float:
+    # Fastest of a few fresh interpreters, in milliseconds
+    return min(
+        float(subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import time; start = time.perf_counter(); "
+                f"{statement}; "
+                "print((time.perf_counter() - start) * 1e3)"
+            ],
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout)
+        for _ in range(5)
+    )
+
+
+def slowest_modules(module: str, count: int):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    times = []
+    for line in result.stderr.splitlines()[1:]:
+        _, own, cumulative, name = (part.strip() for part in line.replace("import time:", "|").split("|"))
+        times.append((int(own), int(cumulative), name))
+
+    for own, cumulative, name in sorted(times, reverse=True)[:count]:
+        print(f"  {name:<40} {own / 1e3:>8.1f} ms {cumulative / 1e3:>8.1f} ms cumulative")
+
+
+if __name__ == "__main__":
+    for statement in (
+        "import numpy, regex",
+        "import jizzy.grammar",
+        "import jizzy.jizz.parser",
+        "import jizzy.jizz.parser; jizzy.jizz.parser.Jizz.finalize()",
+        "import jizzy.jizz.parser; jizzy.jizz.parser.Jizz.warm()",
+    ):
+        print(f"{statement:<60} {import_time(statement):>8.1f} ms")
+
+    print("Slowest modules by own time")
+    slowest_modules("jizzy.jizz.parser", 10)
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import sys
+import regex
+import timeit
+
+from regex import VERSION1
+from typing import Iterator
+
+from inputs import make_json, make_jizz
+from jizzy.common import Token
+from jizzy.grammar import GrammarMeta
+from jizzy.lexer import DfaScanner, RegexScanner
+from jizzy.jizz.parser import Jizz
+from jizzy.json.parser import LenientJson
+
+
+def groupdict_tokens(grammar: GrammarMeta, text: str) -> Iterator[Token]:
+    # What tokenize() used to do: rebuild the alternation on every call and
+    # look for the one group that matched in groupdict()
+    gigaregex = "|".join(
+        f"(?P<_{terminal.idx}>{terminal.pattern})"
+        for terminal in grammar.terminals()
+        if terminal.pattern is not None
+    )
+    symbols = grammar.symbols()
+    for match in regex.finditer(gigaregex, text, flags=VERSION1):
+        for key, value in match.groupdict().items():
+            if value is None:
+                continue
+            yield Token(
+                start=match.start(),
+                stop=match.end(),
+                text=value,
+                type=symbols[int(key[1:])]
+            )
+            break
+
+
+def bench(grammar: GrammarMeta, text: str):
+    token_count = len(grammar.tokenize(text))
+    print(f"{grammar.__name__}: {len(text) / 1e3:.1f} KB, {token_count} tokens")
+
+    regex_scanner = RegexScanner(grammar.terminals())
+    dfa_scanner = DfaScanner(grammar.terminals())
+    for name, scan in [
+        ("groupdict", lambda: list(groupdict_tokens(grammar, text))),
+        ("regex", lambda: list(regex_scanner.scan(text))),
+        ("dfa", lambda: list(dfa_scanner.scan(text))),
+        ("compact", lambda: grammar.tokenize(text, compact=True))
+    ]:
+        seconds = min(timeit.repeat(scan, number=1, repeat=5))
+        print(f"  {name:<12} {token_count / seconds:>12,.0f} tokens/s")
+
+    tokens = grammar.tokenize(text)
+    token_bytes = sum(
+        sys.getsizeof(token) + sys.getsizeof(token.__dict__) + sys.getsizeof(token.text)
+        for token in tokens
+    ) + sys.getsizeof(tokens)
+    buffer = grammar.tokenize(text, compact=True)
+    print(f"  {'list':<12} {token_bytes / 1e6:>12.1f} MB")
+    print(f"  {'buffer':<12} {buffer.nbytes / 1e6:>12.1f} MB")
+
+
+if __name__ == "__main__":
+    bench(LenientJson, make_json(2000))
+    bench(Jizz, make_jizz(2000))
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import timeit
+
+from inputs import make_json, make_json_lines, make_jizz
+from jizzy.grammar import GrammarMeta
+from jizzy.jizz.parser import Jizz
+from jizzy.json.parser import LenientJson
+
+
+def bench(grammar: GrammarMeta, text: str):
+    grammar.warm()
+    token_count = len(grammar.tokenize(text)) + 1
+
+    parse = min(timeit.repeat(lambda: grammar.parse(text), number=1, repeat=5))
+    tokenize = min(timeit.repeat(lambda: grammar.tokenize(text), number=1, repeat=5))
+    print(
+        f"{grammar.__name__:<12} {len(text) / 1e3:>8.1f} KB "
+        f"{token_count:>8} tokens "
+        f"{token_count / parse:>12,.0f} tokens/s "
+        f"({token_count / max(parse - tokenize, 1e-9):>12,.0f} tokens/s without tokenize)"
+    )
+
+
+def bench_lines(grammar: GrammarMeta, text: str):
+    grammar.warm()
+    lines = text.splitlines()
+
+    per_line = min(timeit.repeat(lambda: [grammar.parse(line) for line in lines], number=1, repeat=5))
+    one_pass = min(timeit.repeat(lambda: list(grammar.iter_documents(text)), number=1, repeat=5))
+    print(
+        f"{grammar.__name__:<12} {len(lines):>8} lines "
+        f"{len(lines) / per_line:>12,.0f} lines/s per line "
+        f"{len(lines) / one_pass:>12,.0f} lines/s in one pass"
+    )
+
+
+class ContextualJson(LenientJson):
+    @classmethod
+    def contextual_lexing(cls) -> bool:
+        return True
+
+
+class ContextualJizz(Jizz):
+    @classmethod
+    def contextual_lexing(cls) -> bool:
+        return True
+
+
+if __name__ == "__main__":
+    bench(LenientJson, make_json(2000))
+    bench(ContextualJson, make_json(2000))
+    bench(Jizz, make_jizz(2000))
+    bench(ContextualJizz, make_jizz(2000))
+    bench_lines(LenientJson, make_json_lines(5000))
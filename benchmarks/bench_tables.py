@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import timeit
+
+from inputs import make_json
+from jizzy.grammar import GrammarMeta
+from jizzy.jizz.parser import Jizz
+from jizzy.json.parser import LenientJson
+from jizzy.tables import CompressedTable, SharedTable, TableLayout
+
+
+def bench_lookups(grammar: GrammarMeta):
+    automaton = grammar.tables().automaton
+    compressed = CompressedTable(automaton, len(grammar.terminals()))
+    dense_lists = automaton.tolist()
+    shared = SharedTable(automaton)
+
+    lookups = [
+        (state, symbol)
+        for state, row in enumerate(dense_lists)
+        for symbol, action in enumerate(row)
+        if action != 0
+    ]
+
+    def lookup(rows) -> None:
+        for state, symbol in lookups:
+            rows[state][symbol]
+
+    print(f"{grammar.__name__}: {automaton.shape[0]} states x {automaton.shape[1]} symbols")
+    print(f"  dense int16        {automaton.size * 2:>10} bytes")
+    print(f"  dense {automaton.dtype}        {automaton.nbytes:>10} bytes")
+    print(f"  compressed         {compressed.nbytes:>10} bytes")
+    print(f"  shared             {shared.nbytes:>10} bytes")
+
+    for name, rows in [
+        ("dense numpy", automaton),
+        ("dense lists", dense_lists),
+        ("compressed", compressed),
+        ("shared", shared.rows)
+    ]:
+        seconds = min(timeit.repeat(lambda: lookup(rows), number=10, repeat=5))
+        per_lookup = seconds / (10 * len(lookups)) * 1e9
+        print(f"  {name:<18} {per_lookup:>10.1f} ns/lookup")
+
+
+def bench_build(grammar: GrammarMeta):
+    # Each engine on a fresh subclass, nothing cached from earlier builds
+    for engine in ("deremer-pennello", "iterative"):
+        def build() -> None:
+            class Fresh(grammar):  # type: ignore
+                pass
+
+            Fresh.finalize()
+            Fresh.lalr_make_automaton(engine)
+
+        seconds = min(timeit.repeat(build, number=1, repeat=10))
+        print(f"  build {engine:<18} {seconds * 1e3:>10.1f} ms")
+
+
+def bench_memory(grammar: GrammarMeta):
+    for part, size in grammar.memory_report().items():
+        print(f"  retained {part:<15} {size:>10} bytes")
+
+
+def bench_parse(grammar: GrammarMeta, text: str):
+    for layout in ("dense", "compressed", "shared"):
+        class Layout(grammar):  # type: ignore
+            @classmethod
+            def table_layout(cls) -> TableLayout:
+                return layout  # type: ignore
+
+        Layout.warm()
+        seconds = min(timeit.repeat(lambda: Layout.parse(text), number=1, repeat=3))
+        print(f"  parse {layout:<12} {len(text) / seconds / 1e6:>10.3f} MB/s")
+
+
+if __name__ == "__main__":
+    for grammar in (LenientJson, Jizz):
+        bench_lookups(grammar)
+        bench_build(grammar)
+        bench_memory(grammar)
+
+    print("LenientJson parse")
+    bench_parse(LenientJson, make_json(500))
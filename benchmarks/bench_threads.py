@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import sys
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from inputs import make_json_lines
+from jizzy.json.parser import StrictJson
+
+
+def bench(texts: list[str], threads: int) -> float:
+    def parse_all(offset: int):
+        for text in texts[offset::threads]:
+            StrictJson.parse(text)
+
+    with ThreadPoolExecutor(threads) as executor:
+        start = time.perf_counter()
+        list(executor.map(parse_all, range(threads)))
+        return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    StrictJson.warm()
+    texts = make_json_lines(20000).splitlines()
+
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"StrictJson, {len(texts)} documents, GIL {'enabled' if gil else 'disabled'}")
+
+    single = bench(texts, 1)
+    for threads in (1, 2, 4, 8):
+        seconds = bench(texts, threads)
+        print(
+            f"  {threads:>2} threads {len(texts) / seconds:>12,.0f} documents/s "
+            f"{single / seconds:>6.2f}x"
+        )
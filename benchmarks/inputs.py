@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import json
+
+
+def make_json(count: int) -> str:
+    return json.dumps([
+        {
+            "id": idx,
+            "name": f"item {idx}",
+            "tags": ["a", "b", "c"][:idx % 4],
+            "active": idx % 2 == 0,
+            "parent": None
+        }
+        for idx in range(count)
+    ], indent=2)
+
+
+def make_json_lines(count: int) -> str:
+    return "".join(
+        json.dumps({"id": idx, "level": "info", "message": f"event {idx}", "tags": ["a", "b"]}) + "\n"
+        for idx in range(count)
+    )
+
+
+def make_jizz(count: int) -> str:
+    statements = [
+        "x{idx} = a + b * g(c - d{idx});",
+        "f(x{idx})[i]{{y; z}}",
+        "while (i < n{idx}) {{ i += 1u32; }}",
+        "result.value{idx} -= ++counter::total % 3i64,"
+    ]
+    return "\n".join(
+        statements[idx % len(statements)].format(idx=idx)
+        for idx in range(count)
+    )
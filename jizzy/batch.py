@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import os
+
+from collections import deque
+from typing import Callable, Iterable, Iterator, TYPE_CHECKING
+
+from jizzy.builder import Builder
+from jizzy.common import Node, Source
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+    from multiprocessing.context import BaseContext
+
+    from jizzy.grammar import GrammarMeta
+
+
+type Transform[U: Node, V] = Callable[[U], V]
+
+
+def batches(texts: Iterable[Source], size: int) -> Iterator[list[Source]]:
+    # Groups texts into batches of about size characters, many small
+    # documents share one round trip to a worker while a large one goes
+    # on its own
+    batch: list[Source] = []
+    total = 0
+    for text in texts:
+        batch.append(text)
+        total += len(text)
+        if total >= size:
+            yield batch
+            batch = []
+            total = 0
+
+    if batch:
+        yield batch
+
+
+def parse_batch[T: Builder, U: Node, V](
+    grammar: GrammarMeta[T, U],
+    texts: list[Source],
+    transform: Transform[U, V] | None
+) -> list[U | V]:
+    if transform is None:
+        return [grammar.parse(text) for text in texts]
+    return [transform(grammar.parse(text)) for text in texts]
+
+
+def parse_many[T: Builder, U: Node, V](
+    grammar: GrammarMeta[T, U],
+    texts: Iterable[Source],
+    workers: int | None,
+    transform: Transform[U, V] | None,
+    batch_size: int,
+    mp_context: BaseContext | None
+) -> Iterator[U | V]:
+    # Results come back in the order of texts. Only a couple of batches
+    # per worker are in flight, texts may be a lazy iterable of any length.
+    # mp_context picks the start method of the workers, None leaves it to
+    # the platform default.
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers == 1:
+        for batch in batches(texts, batch_size):
+            yield from parse_batch(grammar, batch, transform)
+        return
+
+    # Imported here, most programs never start a pool
+    from concurrent.futures import ProcessPoolExecutor
+
+    # Forked workers inherit the tables and scanners built here, other
+    # start methods build them again or load them from the cache
+    grammar.warm()
+
+    executor = ProcessPoolExecutor(workers, mp_context=mp_context)
+    try:
+        pending: deque[Future[list[U | V]]] = deque()
+        for batch in batches(texts, batch_size):
+            # Memoryviews and mmaps cannot be pickled, workers get a copy
+            batch = [
+                text if isinstance(text, (str, bytes, bytearray)) else bytes(text)
+                for text in batch
+            ]
+            pending.append(executor.submit(parse_batch, grammar, batch, transform))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        executor.shutdown(cancel_futures=True)
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import os
+import mmap
+import hashlib
+import tempfile
+import numpy as np
+
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, TYPE_CHECKING
+from numpy.typing import NDArray
+
+if TYPE_CHECKING:
+    from jizzy.grammar import GrammarMeta
+
+CACHE_VERSION = 2
+CACHE_DIR_VARIABLE = "JIZZY_CACHE_DIR"
+
+
+def default_cache_dir() -> Path | None:
+    path = os.environ.get(CACHE_DIR_VARIABLE)
+    if not path:
+        return None
+    return Path(path)
+
+
+def callback_identity(callback: Callable[..., Any]) -> str:
+    owner = getattr(callback, "__self__", None)
+    qualname = getattr(callback, "__qualname__", None)
+    if qualname is None:
+        return repr(callback)
+
+    identity = f"{getattr(callback, '__module__', '')}:{qualname}"
+    if isinstance(owner, type):
+        identity = f"{owner.__module__}:{owner.__qualname__}/{identity}"
+    return identity
+
+
+def fingerprint(grammar: GrammarMeta[Any, Any]) -> str:
+    digest = hashlib.sha256()
+
+    def update(*parts: object) -> None:
+        digest.update(repr(parts).encode())
+        digest.update(b"\0")
+
+    update("version", CACHE_VERSION)
+    update("start", grammar.start().name)
+
+    for terminal in grammar.terminals():
+        update("terminal", terminal.idx, terminal.name, terminal.pattern)
+
+    for nonterminal in grammar.nonterminals():
+        update("nonterminal", nonterminal.idx, nonterminal.name)
+
+    for rule in grammar.rules():
+        update(
+            "rule",
+            rule.idx,
+            rule.lhs.name,
+            tuple(symbol.name for symbol in rule.rhs),
+            tuple(rule.parameter_indices),
+            callback_identity(rule.callback)
+        )
+
+    return digest.hexdigest()
+
+
+def cache_path(grammar: GrammarMeta[Any, Any], directory: Path) -> Path:
+    return directory / f"{fingerprint(grammar)}.npz"
+
+
+def table_path(grammar: GrammarMeta[Any, Any], directory: Path) -> Path:
+    return directory / f"{fingerprint(grammar)}.table"
+
+
+def metadata(grammar: GrammarMeta[Any, Any]) -> dict[str, NDArray[Any]]:
+    rules = grammar.rules()
+    return dict(
+        symbols=np.array([symbol.name for symbol in grammar.symbols()]),
+        rule_lhs=np.array([rule.lhs.idx for rule in rules], dtype=np.int32),
+        rule_sizes=np.array([len(rule.rhs) for rule in rules], dtype=np.int32)
+    )
+
+
+def load_automaton(
+    grammar: GrammarMeta[Any, Any],
+    directory: Path
+) -> NDArray[np.integer] | None:
+    path = cache_path(grammar, directory)
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            stored: dict[str, NDArray[Any]] = {key: data[key] for key in data.files}
+    except (OSError, ValueError):
+        return None
+
+    try:
+        automaton = stored.pop("automaton")
+    except KeyError:
+        return None
+
+    for key, value in metadata(grammar).items():
+        if key not in stored or not np.array_equal(stored[key], value):
+            return None
+
+    return automaton
+
+
+def write_atomically(path: Path, write: Callable[[BinaryIO], object]) -> None:
+    # Readers see either no file or a complete one, never a partial write
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temporary = tempfile.mkstemp(
+        dir=path.parent,
+        prefix=f".{path.stem}-",
+        suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as file:
+            write(file)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def store_automaton(
+    grammar: GrammarMeta[Any, Any],
+    directory: Path,
+    automaton: NDArray[np.integer]
+) -> None:
+    try:
+        write_atomically(
+            cache_path(grammar, directory),
+            lambda file: np.savez(
+                file,
+                allow_pickle=False,
+                automaton=automaton,
+                **metadata(grammar)
+            )
+        )
+    except OSError:
+        pass
+
+
+def map_table(
+    grammar: GrammarMeta[Any, Any],
+    directory: Path,
+    automaton: NDArray[np.integer]
+) -> mmap.mmap | None:
+    # The automaton as raw C ints in a file of its own, mapped read only.
+    # Every process mapping the file shares its pages through the page
+    # cache. A missing or stale file is written first.
+    path = table_path(grammar, directory)
+    data = np.ascontiguousarray(automaton, dtype=np.intc)
+
+    for _ in range(2):
+        try:
+            with open(path, "rb") as file:
+                buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # Missing, or empty and so impossible to map
+            pass
+        else:
+            if len(buffer) == data.nbytes and np.array_equal(np.frombuffer(buffer, dtype=np.intc), data.ravel()):
+                return buffer
+            buffer.close()
+
+        try:
+            write_atomically(path, lambda file: file.write(data.tobytes()))
+        except OSError:
+            return None
+
+    return None
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
+from mmap import mmap
 from dataclasses import dataclass, field
+from functools import cached_property
 from typing import Callable, Iterator, TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -18,6 +20,14 @@ class ShiftReduceConflict(Exception):
     pass
 
 
+# What can be scanned, bytes-like sources are scanned bytewise with token
+# offsets counted in bytes. Patterns get ASCII semantics there, bytes above
+# 0x7f match negated sets like [^"] and the dot but never \w, \d or \s. A
+# UTF-8 identifier that scans as str fails to scan as bytes. Token text is
+# decoded as UTF-8.
+type Source = str | bytes | bytearray | memoryview | mmap
+
+
 @dataclass(kw_only=True)
 class Node:
     start: int
@@ -39,10 +49,64 @@ class List[T: Node](Node):
         yield from self.items
 
 
-@dataclass(kw_only=True)
 class Token(Node):
-    text: str
+    # Scanned tokens keep a reference to the source and slice their text
+    # out of it on first access, tokens no callback reads never copy it.
+    # Text sliced from bytes-like sources is decoded as UTF-8. Tokens can
+    # also be given their text directly.
     type: Symbol
+    source: Source
+
+    def __init__(
+        self,
+        *,
+        start: int,
+        stop: int,
+        type: Symbol,
+        text: str | None = None,
+        source: Source = ""
+    ):
+        self.start = start
+        self.stop = stop
+        self.type = type
+        self.source = source
+        if text is not None:
+            self.__dict__["text"] = text
+
+    @cached_property
+    def text(self) -> str:
+        text = self.source[self.start:self.stop]
+        if isinstance(text, str):
+            return text
+        return str(text, "utf-8")
+
+    def __eq__(self, other: object) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+
+        assert isinstance(other, Token)
+        return (
+            self.start == other.start and
+            self.stop == other.stop and
+            self.type == other.type and
+            self.text == other.text
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"Token(start={self.start!r}, stop={self.stop!r}, "
+            f"text={self.text!r}, type={self.type!r})"
+        )
+
+    def __getstate__(self) -> dict[str, object]:
+        # Pickle the text, not the whole source it was sliced from
+        return {
+            "start": self.start,
+            "stop": self.stop,
+            "type": self.type,
+            "source": "",
+            "text": self.text
+        }
 
     def __str__(self) -> str:
         return self.text
@@ -65,6 +129,9 @@ class Symbol(LexicalElement):
 @dataclass(kw_only=True)
 class Terminal(Symbol):
     pattern: str | None
+    # Skipped terminals are matched and dropped by the scanner, they never
+    # reach the parser
+    skip: bool = False
 
     def __hash__(self) -> int:
         return self.idx
@@ -0,0 +1,627 @@
+from __future__ import annotations
+
+import regex
+import numpy as np
+
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Sequence
+from numpy.typing import NDArray
+
+
+class UnsupportedPattern(ValueError):
+    pass
+
+
+ASCII_DIGITS = frozenset(range(ord("0"), ord("9") + 1))
+ASCII_WORD = frozenset(
+    code
+    for code in range(128)
+    if chr(code).isalnum() or chr(code) == "_"
+)
+ASCII_SPACE = frozenset(map(ord, " \t\n\r\f\v"))
+
+# Whether a non-ASCII character is a digit, word or space character is
+# left to regex itself, the terminal patterns are regex patterns and its
+# Unicode data can be newer than the unicodedata module's
+UNICODE_DIGIT = regex.compile(r"\d", flags=regex.VERSION1)
+UNICODE_WORD = regex.compile(r"\w", flags=regex.VERSION1)
+UNICODE_SPACE = regex.compile(r"\s", flags=regex.VERSION1)
+
+
+@lru_cache(maxsize=4096)
+def char_properties(char: str) -> int:
+    # Column of Dfa.unicode_classes for char, its digit, word and space
+    # properties as bits 2, 1 and 0
+    return (
+        (UNICODE_DIGIT.match(char) is not None) << 2 |
+        (UNICODE_WORD.match(char) is not None) << 1 |
+        (UNICODE_SPACE.match(char) is not None)
+    )
+
+ESCAPES = {
+    "n": "\n",
+    "t": "\t",
+    "r": "\r",
+    "f": "\f",
+    "v": "\v",
+    "a": "\a",
+    "0": "\0"
+}
+CATEGORIES = set("dDwWsS")
+
+
+@dataclass(kw_only=True, frozen=True)
+class CharSet:
+    ranges: tuple[tuple[int, int], ...] = ()
+    # d/w/s and their negations D/W/S, plus "." for anything but "\n"
+    categories: frozenset[str] = frozenset()
+    negated: bool = False
+
+    def matches(
+        self,
+        code: int,
+        digit: bool,
+        word: bool,
+        space: bool
+    ) -> bool:
+        found = any(low <= code <= high for low, high in self.ranges)
+        for category in self.categories:
+            if found:
+                break
+            match category:
+                case "d":
+                    found = digit
+                case "D":
+                    found = not digit
+                case "w":
+                    found = word
+                case "W":
+                    found = not word
+                case "s":
+                    found = space
+                case "S":
+                    found = not space
+                case ".":
+                    found = code != ord("\n")
+        return found != self.negated
+
+
+@dataclass(kw_only=True, frozen=True)
+class Node:
+    pass
+
+
+@dataclass(kw_only=True, frozen=True)
+class Chars(Node):
+    chars: CharSet
+
+
+@dataclass(kw_only=True, frozen=True)
+class Concat(Node):
+    items: tuple[Node, ...]
+
+
+@dataclass(kw_only=True, frozen=True)
+class Alternation(Node):
+    options: tuple[Node, ...]
+
+
+@dataclass(kw_only=True, frozen=True)
+class Repetition(Node):
+    item: Node
+    minimum: int
+    maximum: int | None
+
+
+class PatternParser:
+    # Recursive descent parser for the regular subset of the regex syntax,
+    # anything that needs more than a finite automaton (anchors,
+    # lookaround, backreferences, lazy or possessive quantifiers, inline
+    # flags, ...) raises UnsupportedPattern
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.position = 0
+
+    def unsupported(self, reason: str) -> UnsupportedPattern:
+        return UnsupportedPattern(
+            f"{reason} at position {self.position} of {self.pattern!r}"
+        )
+
+    def peek(self) -> str | None:
+        if self.position < len(self.pattern):
+            return self.pattern[self.position]
+        return None
+
+    def take(self) -> str:
+        char = self.pattern[self.position]
+        self.position += 1
+        return char
+
+    def parse(self) -> Node:
+        node = self.parse_alternation()
+        if self.position != len(self.pattern):
+            raise self.unsupported("Unbalanced parenthesis")
+        return node
+
+    def parse_alternation(self) -> Node:
+        options = [self.parse_concat()]
+        while self.peek() == "|":
+            self.take()
+            options.append(self.parse_concat())
+
+        if len(options) == 1:
+            return options[0]
+        return Alternation(options=tuple(options))
+
+    def parse_concat(self) -> Node:
+        items: list[Node] = []
+        while (char := self.peek()) is not None and char not in "|)":
+            items.append(self.parse_repetition())
+
+        if len(items) == 1:
+            return items[0]
+        return Concat(items=tuple(items))
+
+    def parse_repetition(self) -> Node:
+        node = self.parse_atom()
+        while (char := self.peek()) is not None and char in "*+?{":
+            if char == "{":
+                bounds = self.parse_bounds()
+                if bounds is None:
+                    break
+                minimum, maximum = bounds
+            else:
+                self.take()
+                minimum, maximum = {
+                    "*": (0, None),
+                    "+": (1, None),
+                    "?": (0, 1)
+                }[char]
+
+            if self.peek() in ("?", "+"):
+                raise self.unsupported("Lazy or possessive quantifier")
+
+            node = Repetition(item=node, minimum=minimum, maximum=maximum)
+        return node
+
+    def parse_bounds(self) -> tuple[int, int | None] | None:
+        end = self.pattern.find("}", self.position)
+        if end < 0:
+            return None
+
+        body = self.pattern[self.position + 1:end]
+        low, comma, high = body.partition(",")
+        if not low.isdigit() or (high and not high.isdigit()):
+            # Not a quantifier, regex treats the brace as a literal
+            return None
+
+        self.position = end + 1
+        minimum = int(low)
+        if not comma:
+            return minimum, minimum
+        if not high:
+            return minimum, None
+        if int(high) < minimum:
+            raise self.unsupported("Invalid repetition bounds")
+        return minimum, int(high)
+
+    def parse_atom(self) -> Node:
+        char = self.take()
+        match char:
+            case "(":
+                if self.peek() == "?":
+                    self.take()
+                    if self.pattern.startswith(":", self.position):
+                        self.position += 1
+                    elif self.pattern.startswith("P<", self.position):
+                        end = self.pattern.find(">", self.position)
+                        if end < 0:
+                            raise self.unsupported("Unterminated group name")
+                        self.position = end + 1
+                    else:
+                        raise self.unsupported("Group extension")
+
+                node = self.parse_alternation()
+                if self.peek() != ")":
+                    raise self.unsupported("Unbalanced parenthesis")
+                self.take()
+                return node
+            case "[":
+                return Chars(chars=self.parse_set())
+            case ".":
+                return Chars(chars=CharSet(categories=frozenset(".")))
+            case "\\":
+                return Chars(chars=self.parse_escape())
+            case "^" | "$":
+                raise self.unsupported("Anchor")
+            case "*" | "+" | "?":
+                raise self.unsupported("Nothing to repeat")
+            case _:
+                return Chars(chars=CharSet(ranges=((ord(char), ord(char)),)))
+
+    def parse_escape(self) -> CharSet:
+        if self.peek() is None:
+            raise self.unsupported("Trailing backslash")
+
+        char = self.take()
+        if char in CATEGORIES:
+            return CharSet(categories=frozenset(char))
+
+        code = self.parse_escaped_code(char)
+        return CharSet(ranges=((code, code),))
+
+    def parse_escaped_code(self, char: str) -> int:
+        if char in ESCAPES:
+            return ord(ESCAPES[char])
+
+        if char in "xuU":
+            width = {"x": 2, "u": 4, "U": 8}[char]
+            digits = self.pattern[self.position:self.position + width]
+            if len(digits) != width or any(
+                digit not in "0123456789abcdefABCDEF"
+                for digit in digits
+            ):
+                raise self.unsupported("Invalid hexadecimal escape")
+            self.position += width
+            return int(digits, 16)
+
+        if char.isalnum():
+            raise self.unsupported(f"Escape \\{char}")
+
+        return ord(char)
+
+    def parse_set(self) -> CharSet:
+        negated = False
+        if self.peek() == "^":
+            self.take()
+            negated = True
+
+        ranges: list[tuple[int, int]] = []
+        categories: set[str] = set()
+
+        first = True
+        while True:
+            char = self.peek()
+            if char is None:
+                raise self.unsupported("Unterminated character set")
+
+            if char == "]" and not first:
+                self.take()
+                break
+
+            first = False
+            self.take()
+
+            if char == "[":
+                raise self.unsupported("Nested character set")
+
+            if char == "\\":
+                if self.peek() is None:
+                    raise self.unsupported("Trailing backslash")
+                escaped = self.take()
+                if escaped in CATEGORIES:
+                    categories.add(escaped)
+                    continue
+                low = self.parse_escaped_code(escaped)
+            else:
+                low = ord(char)
+
+            high = low
+            if self.peek() == "-" and self.pattern[self.position + 1:self.position + 2] not in ("]", ""):
+                self.take()
+                char = self.take()
+                if char == "\\":
+                    escaped = self.take()
+                    if escaped in CATEGORIES:
+                        raise self.unsupported("Range over a character class")
+                    high = self.parse_escaped_code(escaped)
+                else:
+                    high = ord(char)
+
+                if high < low:
+                    raise self.unsupported("Invalid character range")
+
+            ranges.append((low, high))
+
+        return CharSet(
+            ranges=tuple(ranges),
+            categories=frozenset(categories),
+            negated=negated
+        )
+
+
+@dataclass
+class Nfa:
+    epsilon: list[list[int]] = field(default_factory=list)
+    edges: list[list[tuple[CharSet, int]]] = field(default_factory=list)
+    # Terminal priority for accepting states
+    accepts: dict[int, int] = field(default_factory=dict)
+
+    def state(self) -> int:
+        self.epsilon.append([])
+        self.edges.append([])
+        return len(self.epsilon) - 1
+
+    def build(self, node: Node) -> tuple[int, int]:
+        start = self.state()
+
+        match node:
+            case Chars(chars=chars):
+                end = self.state()
+                self.edges[start].append((chars, end))
+            case Concat(items=items):
+                end = start
+                for item in items:
+                    item_start, item_end = self.build(item)
+                    self.epsilon[end].append(item_start)
+                    end = item_end
+            case Alternation(options=options):
+                end = self.state()
+                for option in options:
+                    option_start, option_end = self.build(option)
+                    self.epsilon[start].append(option_start)
+                    self.epsilon[option_end].append(end)
+            case Repetition(item=item, minimum=minimum, maximum=maximum):
+                end = start
+                for _ in range(minimum):
+                    item_start, item_end = self.build(item)
+                    self.epsilon[end].append(item_start)
+                    end = item_end
+
+                if maximum is None:
+                    item_start, item_end = self.build(item)
+                    loop_end = self.state()
+                    self.epsilon[end].extend([item_start, loop_end])
+                    self.epsilon[item_end].extend([item_start, loop_end])
+                    end = loop_end
+                else:
+                    optional_end = self.state()
+                    for _ in range(maximum - minimum):
+                        item_start, item_end = self.build(item)
+                        self.epsilon[end].extend([item_start, optional_end])
+                        end = item_end
+                    self.epsilon[end].append(optional_end)
+                    end = optional_end
+            case _:
+                end = start
+
+        return start, end
+
+    def closure(self, states: Sequence[int]) -> frozenset[int]:
+        seen = set(states)
+        stack = list(states)
+        while stack:
+            for target in self.epsilon[stack.pop()]:
+                if target not in seen:
+                    seen.add(target)
+                    stack.append(target)
+        return frozenset(seen)
+
+
+@dataclass(kw_only=True, frozen=True)
+class Dfa:
+    # transitions[state, char_class], -1 is the dead state
+    transitions: NDArray[np.int32]
+    # Index into the patterns the DFA was built from, -1 if not accepting
+    accepts: NDArray[np.int32]
+    # Bitmasks of every pattern a state accepts and of every pattern still
+    # reachable from it, for scanning with only some patterns enabled
+    accept_sets: tuple[int, ...]
+    live_sets: tuple[int, ...]
+    # Character classes of every ASCII code point and of every byte
+    ascii_classes: NDArray[np.int32]
+    byte_classes: NDArray[np.int32]
+    # Non-ASCII code points are classified by the segment of the code
+    # point space they fall in and by their digit/word/space properties
+    boundaries: tuple[int, ...]
+    unicode_classes: NDArray[np.int32]
+
+    @classmethod
+    def from_patterns(cls, patterns: Sequence[str]) -> Dfa:
+        nfa = Nfa()
+        start = nfa.state()
+        for priority, pattern in enumerate(patterns):
+            pattern_start, pattern_end = nfa.build(PatternParser(pattern).parse())
+            nfa.epsilon[start].append(pattern_start)
+            nfa.accepts[pattern_end] = priority
+
+        charsets = list({
+            chars: None
+            for edges in nfa.edges
+            for chars, _ in edges
+        })
+
+        # Characters that every charset treats the same way share a class
+        signatures: dict[tuple[bool, ...], int] = {}
+
+        def classify(code: int, digit: bool, word: bool, space: bool) -> int:
+            signature = tuple(
+                chars.matches(code, digit, word, space)
+                for chars in charsets
+            )
+            return signatures.setdefault(signature, len(signatures))
+
+        ascii_classes = [
+            classify(
+                code,
+                code in ASCII_DIGITS,
+                code in ASCII_WORD,
+                code in ASCII_SPACE
+            )
+            for code in range(128)
+        ]
+
+        boundaries = sorted({128} | {
+            bound
+            for chars in charsets
+            for low, high in chars.ranges
+            for bound in (low, high + 1)
+            if bound > 128
+        })
+        unicode_classes = [
+            [
+                classify(
+                    boundary,
+                    bool(properties & 4),
+                    bool(properties & 2),
+                    bool(properties & 1)
+                )
+                for properties in range(8)
+            ]
+            for boundary in boundaries
+        ]
+
+        # Bytes input is classified bytewise with ASCII semantics, bytes
+        # above 0x7f are in no explicit range and have no properties
+        byte_classes = ascii_classes + [classify(-1, False, False, False)] * 128
+
+        class_charsets = [list[int]() for _ in signatures]
+        for signature, char_class in signatures.items():
+            class_charsets[char_class] = [
+                idx
+                for idx, matched in enumerate(signature)
+                if matched
+            ]
+        charset_idx = {chars: idx for idx, chars in enumerate(charsets)}
+
+        # Subset construction
+        initial = nfa.closure([start])
+        state_to_idx = {initial: 0}
+        subsets = [initial]
+        transitions: list[list[int]] = []
+        idx = 0
+        while idx != len(subsets):
+            subset = subsets[idx]
+            row: list[int] = []
+            for members in class_charsets:
+                matched = set(members)
+                targets = [
+                    target
+                    for state in subset
+                    for chars, target in nfa.edges[state]
+                    if charset_idx[chars] in matched
+                ]
+                if not targets:
+                    row.append(-1)
+                    continue
+
+                target_subset = nfa.closure(targets)
+                target = state_to_idx.setdefault(target_subset, len(subsets))
+                if target == len(subsets):
+                    subsets.append(target_subset)
+                row.append(target)
+
+            transitions.append(row)
+            idx += 1
+
+        accept_sets = [
+            sum(
+                1 << nfa.accepts[state]
+                for state in subset
+                if state in nfa.accepts
+            )
+            for subset in subsets
+        ]
+
+        transitions, accept_sets = minimize(transitions, accept_sets)
+
+        live_sets = list(accept_sets)
+        changed = True
+        while changed:
+            changed = False
+            for state, row in enumerate(transitions):
+                live = live_sets[state]
+                for target in row:
+                    if target >= 0:
+                        live |= live_sets[target]
+                if live != live_sets[state]:
+                    live_sets[state] = live
+                    changed = True
+
+        # Declaration order breaks ties, the lowest pattern index wins
+        accepts = [
+            (accept_set & -accept_set).bit_length() - 1
+            for accept_set in accept_sets
+        ]
+
+        return cls(
+            transitions=np.array(transitions, dtype=np.int32).reshape(len(accepts), len(signatures)),
+            accepts=np.array(accepts, dtype=np.int32),
+            accept_sets=tuple(accept_sets),
+            live_sets=tuple(live_sets),
+            ascii_classes=np.array(ascii_classes, dtype=np.int32),
+            byte_classes=np.array(byte_classes, dtype=np.int32),
+            boundaries=tuple(boundaries),
+            unicode_classes=np.array(unicode_classes, dtype=np.int32)
+        )
+
+    def char_class(self, char: str) -> int:
+        code = ord(char)
+        if code < 128:
+            return int(self.ascii_classes[code])
+
+        segment = bisect_right(self.boundaries, code) - 1
+        return int(self.unicode_classes[segment, char_properties(char)])
+
+    def longest_match(self, text: str, start: int = 0) -> tuple[int, int]:
+        # (pattern index, end) of the longest non-empty match at start,
+        # pattern index is -1 if nothing matches
+        state = 0
+        accepted = -1
+        stop = start
+        for position in range(start, len(text)):
+            state = int(self.transitions[state, self.char_class(text[position])])
+            if state < 0:
+                break
+
+            if self.accepts[state] >= 0:
+                accepted = int(self.accepts[state])
+                stop = position + 1
+        return accepted, stop
+
+
+def minimize(
+    transitions: list[list[int]],
+    accept_sets: list[int]
+) -> tuple[list[list[int]], list[int]]:
+    # Moore's partition refinement, states start out split by what they
+    # accept and are split further until every block agrees on the block
+    # each character class leads to
+    blocks = list(accept_sets)
+    while True:
+        signatures: dict[tuple[int, ...], int] = {}
+        refined = [
+            signatures.setdefault(
+                (
+                    blocks[state],
+                    *(blocks[target] if target >= 0 else -1 for target in row)
+                ),
+                len(signatures)
+            )
+            for state, row in enumerate(transitions)
+        ]
+        if len(signatures) == len(set(blocks)):
+            break
+        blocks = refined
+
+    # Renumber blocks so the initial state stays 0
+    order: dict[int, int] = {}
+    for block in refined:
+        order.setdefault(block, len(order))
+
+    minimized: list[list[int] | None] = [None] * len(order)
+    minimized_accept_sets = [0] * len(order)
+    for state, block in enumerate(refined):
+        idx = order[block]
+        if minimized[idx] is not None:
+            continue
+        minimized[idx] = [
+            order[refined[target]] if target >= 0 else -1
+            for target in transitions[state]
+        ]
+        minimized_accept_sets[idx] = accept_sets[state]
+
+    return [row for row in minimized if row is not None], minimized_accept_sets
+
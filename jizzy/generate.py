@@ -0,0 +1,340 @@
+from __future__ import annotations
+
+import sys
+import argparse
+import importlib
+
+from pathlib import Path
+from typing import Any, Callable, TYPE_CHECKING, cast
+
+from jizzy.common import Rule
+from jizzy.dfa import char_properties
+from jizzy.lexer import DfaScanner, RegexScanner
+
+if TYPE_CHECKING:
+    from jizzy.grammar import GrammarMeta
+
+
+class ModuleWriter:
+    def __init__(self, origin: str):
+        self.origin = origin
+        self.lines: list[str] = []
+        self.imports: dict[str, str] = {}
+
+    def emit(self, line: str = "") -> None:
+        self.lines.append(line)
+
+    def module_alias(self, module: str) -> str:
+        return self.imports.setdefault(module, f"_m{len(self.imports)}")
+
+    def reference(self, obj: Any) -> str:
+        # Module-level expression evaluating to obj, only objects that can
+        # be found again by module and qualified name are supported
+        owner = getattr(obj, "__self__", None)
+        if isinstance(owner, type):
+            return f"{self.reference(owner)}.{obj.__func__.__name__}"
+
+        module = getattr(obj, "__module__", None)
+        qualname = getattr(obj, "__qualname__", None)
+        if module is None or qualname is None or "<locals>" in qualname:
+            raise ValueError(f"Cannot reference {obj!r} from a generated module")
+
+        resolved: Any = importlib.import_module(module)
+        for part in qualname.split("."):
+            resolved = getattr(resolved, part, None)
+        if resolved is not obj:
+            raise ValueError(f"Cannot reference {obj!r} from a generated module")
+
+        return f"{self.module_alias(module)}.{qualname}"
+
+    def source(self) -> str:
+        header = [
+            f"# Generated by jizzy from {self.origin}, do not edit",
+            "",
+            "from __future__ import annotations",
+            "",
+            "from typing import Any, Iterator",
+            "",
+            "from jizzy.common import Node, ParseError, Terminal, Token",
+            "",
+            *(
+                f"import {module} as {alias}"
+                for module, alias in self.imports.items()
+            ),
+        ]
+        return "\n".join([*header, *self.lines]) + "\n"
+
+
+def emit_reducer(
+    writer: ModuleWriter,
+    rule: Rule,
+    callback: str
+) -> None:
+    size = len(rule.rhs)
+    arguments = "".join(
+        f", values[{idx - size}]"
+        for idx in rule.parameter_indices
+    )
+
+    writer.emit()
+    writer.emit()
+    writer.emit(f"def _reduce_{rule.idx}(builder: Any, states: list[int], values: list[Any], token: Token):")
+    writer.emit(f"    # {rule.lhs.name} -> {' '.join(symbol.name for symbol in rule.rhs)}")
+
+    if size == 0:
+        writer.emit(f"    values.append({callback}(builder, values[-1].stop, token.start))")
+        writer.emit(f"    states.append(_GOTO_{rule.lhs.idx}[states[-1]])")
+    elif size == 1:
+        writer.emit(f"    values[-1] = {callback}(builder, values[-1].start, values[-1].stop{arguments})")
+        writer.emit(f"    states[-1] = _GOTO_{rule.lhs.idx}[states[-2]]")
+    else:
+        writer.emit(f"    result = {callback}(builder, values[-{size}].start, values[-1].stop{arguments})")
+        writer.emit(f"    del values[-{size}:]")
+        writer.emit(f"    del states[-{size}:]")
+        writer.emit("    values.append(result)")
+        writer.emit(f"    states.append(_GOTO_{rule.lhs.idx}[states[-1]])")
+
+
+def emit_regex_scanner(writer: ModuleWriter, scanner: RegexScanner) -> None:
+    groups = tuple(
+        terminal.idx if terminal is not None else None
+        for terminal in scanner.groups
+    )
+    regex = writer.module_alias("regex")
+    flags = f"{regex}.VERSION1 | {regex}.POSIX" if scanner.longest else f"{regex}.VERSION1"
+
+    writer.emit()
+    writer.emit(f"SCANNER = {regex}.compile({scanner.pattern.pattern!r}, flags={flags})")
+    writer.emit(f"GROUPS = tuple(TERMINALS[idx] if idx is not None else None for idx in {groups!r})")
+    writer.emit('''
+
+def scan(text: str) -> Iterator[Token]:
+    groups = GROUPS
+    position = 0
+    for match in SCANNER.finditer(text):
+        start = match.start()
+        if start != position:
+            raise _unmatched(text, position)
+
+        position = match.end()
+        terminal = groups[match.lastindex]
+        if terminal.skip:
+            continue
+
+        yield Token(
+            start=start,
+            stop=position,
+            source=text,
+            type=terminal
+        )
+
+    if position != len(text):
+        raise _unmatched(text, position)
+''')
+
+
+def emit_dfa_scanner(writer: ModuleWriter, scanner: DfaScanner) -> None:
+    dfa = scanner.dfa
+    accepts = tuple(
+        terminal.idx if terminal is not None else None
+        for terminal in scanner.accepts
+    )
+    bisect = writer.module_alias("bisect")
+    properties = writer.reference(char_properties)
+
+    writer.emit()
+    writer.emit("TRANSITIONS = (")
+    for row in scanner.transitions:
+        writer.emit(f"    {tuple(row)!r},")
+    writer.emit(")")
+    writer.emit(f"ACCEPTS = tuple(TERMINALS[idx] if idx is not None else None for idx in {accepts!r})")
+    writer.emit(f"ASCII_CLASSES = {tuple(scanner.ascii_classes)!r}")
+    writer.emit(f"BOUNDARIES = {dfa.boundaries!r}")
+    writer.emit(f"UNICODE_CLASSES = {tuple(map(tuple, dfa.unicode_classes.tolist()))!r}")
+    writer.emit(f'''
+
+def _char_class(char: str) -> int:
+    segment = {bisect}.bisect_right(BOUNDARIES, ord(char)) - 1
+    return UNICODE_CLASSES[segment][{properties}(char)]
+
+
+def scan(text: str) -> Iterator[Token]:
+    transitions = TRANSITIONS
+    accepts = ACCEPTS
+    ascii_classes = ASCII_CLASSES
+
+    start = 0
+    length = len(text)
+    while start < length:
+        state = 0
+        accepted = None
+        stop = start
+        for position in range(start, length):
+            code = ord(text[position])
+            state = transitions[state][
+                ascii_classes[code] if code < 128 else _char_class(text[position])
+            ]
+            if state < 0:
+                break
+
+            if accepts[state] is not None:
+                accepted = accepts[state]
+                stop = position + 1
+
+        if accepted is None:
+            raise _unmatched(text, start)
+
+        if not accepted.skip:
+            yield Token(
+                start=start,
+                stop=stop,
+                source=text,
+                type=accepted
+            )
+        start = stop
+''')
+
+
+def generate_module(grammar: GrammarMeta[Any, Any]) -> str:
+    if grammar.contextual_lexing():
+        raise ValueError("Generated modules do not support contextual lexing")
+
+    tables = grammar.tables()
+    automaton = grammar.automaton().tolist()
+    terminals = grammar.terminals()
+    rules = grammar.rules()
+
+    writer = ModuleWriter(f"{grammar.__module__}:{grammar.__qualname__}")
+    writer.emit()
+    writer.emit()
+    writer.emit(f"BUILDER = {writer.reference(grammar.builder())}")
+
+    writer.emit()
+    writer.emit("TERMINALS = (")
+    for terminal in terminals:
+        writer.emit(f"    Terminal(name={terminal.name!r}, pattern={terminal.pattern!r}, skip={terminal.skip!r}, idx={terminal.idx}),")
+    writer.emit(")")
+
+    writer.emit('''
+
+def _unmatched(text: str, position: int) -> ParseError:
+    return ParseError(
+        f"Unexpected character: {text[position]!r} at position {position}"
+    )
+''')
+
+    scanner = grammar.scanner()
+    if isinstance(scanner, DfaScanner):
+        emit_dfa_scanner(writer, scanner)
+    else:
+        emit_regex_scanner(writer, scanner)
+
+    # Only the terminal columns are ever looked up per token, the goto
+    # columns are split out per nonterminal below
+    writer.emit()
+    writer.emit("ACTIONS = (")
+    for row in automaton:
+        writer.emit(f"    {tuple(row[:len(terminals)])!r},")
+    writer.emit(")")
+
+    writer.emit()
+    writer.emit("EXPECTED = (")
+    for expected in tables.expected:
+        writer.emit(f"    {', '.join(terminal.name for terminal in expected)!r},")
+    writer.emit(")")
+
+    for nonterminal in grammar.nonterminals():
+        if not nonterminal.rules or nonterminal.idx == rules[0].lhs.idx:
+            continue
+        column = tuple(row[nonterminal.idx] - 1 for row in automaton)
+        writer.emit()
+        writer.emit(f"_GOTO_{nonterminal.idx} = {column!r}")
+
+    callbacks: dict[Callable[..., Any], str] = {}
+    for rule in rules[1:]:
+        callback = callbacks.get(rule.callback)
+        if callback is None:
+            callback = callbacks[rule.callback] = f"_callback_{len(callbacks)}"
+            writer.emit(f"{callback} = {writer.reference(rule.callback)}")
+
+        emit_reducer(writer, rule, callback)
+
+    writer.emit()
+    writer.emit()
+    writer.emit("REDUCERS = (")
+    writer.emit("    None,")
+    for rule in rules[1:]:
+        writer.emit(f"    _reduce_{rule.idx},")
+    writer.emit(")")
+
+    writer.emit('''
+
+def tokenize(text: str) -> list[Token]:
+    return list(scan(text))
+
+
+def parse(text: str, builder: Any = None) -> Any:
+    if builder is None:
+        builder = BUILDER()
+
+    actions = ACTIONS
+    reducers = REDUCERS
+
+    states = [0]
+    values: list[Any] = [Node(start=0, stop=0)]
+
+    eof_token = Token(
+        start=len(text),
+        stop=len(text),
+        text="$",
+        type=TERMINALS[0]
+    )
+    tokens = scan(text)
+    while True:
+        token = next(tokens, eof_token)
+        symbol = token.type.idx
+        while True:
+            action = actions[states[-1]][symbol]
+            if action > 0:
+                states.append(action - 1)
+                values.append(token)
+                break
+            elif action < -1:
+                reducers[-action - 1](builder, states, values, token)
+            elif action == -1:
+                return values[-1]
+            else:
+                raise ParseError(
+                    f"Unexpected token: {token.text!r} ({token.type.name}), "
+                    f"expected one of: {EXPECTED[states[-1]]}"
+                )''')
+
+    return writer.source()
+
+
+def load_grammar(reference: str) -> GrammarMeta[Any, Any]:
+    module, _, qualname = reference.partition(":")
+    if not qualname:
+        raise ValueError(f"Expected module:Grammar, got {reference!r}")
+
+    grammar: Any = importlib.import_module(module)
+    for part in qualname.split("."):
+        grammar = getattr(grammar, part)
+    return cast("GrammarMeta[Any, Any]", grammar)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m jizzy.generate",
+        description="Generate a standalone parser module from a grammar"
+    )
+    parser.add_argument("grammar", help="grammar to generate, as module:Grammar")
+    parser.add_argument("output", type=Path, help="path of the generated module")
+    arguments = parser.parse_args(argv)
+
+    load_grammar(arguments.grammar).generate_module(arguments.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
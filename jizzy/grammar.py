@@ -1,70 +1,120 @@
 from __future__ import annotations
 from abc import abstractmethod
 
-import regex
+import mmap
+import threading
 import numpy as np
 
-from regex import VERSION1
-from functools import cache
-from collections import defaultdict
+from os import PathLike
+from pathlib import Path
+from collections import defaultdict, deque
 from dataclasses import dataclass
-from typing import Any, Iterable, Match, Iterator, TypeVar, cast
+from typing import Any, AsyncIterable, IO, Iterable, Literal, Iterator, TypeVar, TYPE_CHECKING, cast, overload
 from numpy.typing import NDArray
 
-from jizzy.common import Parameter, LexicalElement, NonTerminal, ParseError, Rule, Terminal, Symbol, Token, Node
+from jizzy.common import Parameter, LexicalElement, NonTerminal, Rule, Source, Terminal, Symbol, Token, Node
+from jizzy.batch import Transform, parse_many
 from jizzy.builder import Builder
-from jizzy.helpers import frozenlist
+from jizzy.cache import default_cache_dir, load_automaton, map_table, store_automaton
+from jizzy.generate import generate_module
+from jizzy.lexer import LexerKind, Scanner, TokenBuffer, as_source, make_scanner, unmatched
+from jizzy.helpers import bit_array, bits, deep_sizeof, digraph
 from jizzy.operators import Repeat
+from jizzy.parser import Parser, iter_documents, parse_async
+from jizzy.tables import ParseTables, TableLayout
+
+if TYPE_CHECKING:
+    import asyncio
+
+    from multiprocessing.context import BaseContext
 
 T = TypeVar("T", bound=Builder)
 U = TypeVar("U", bound=Node)
 
-
-@dataclass(kw_only=True, frozen=True)
-class ClosureItemLR0:
-    rule: Rule
-    position: int
-
-    def current(self) -> NonTerminal | Terminal:
-        return cast(
-            NonTerminal | Terminal,
-            self.rule.rhs[self.position]
-        )
+LalrEngine = Literal["iterative", "deremer-pennello"]
 
 
 @dataclass(kw_only=True, frozen=True)
-class ClosureItemCLR(ClosureItemLR0):
-    lookahead: frozenset[Terminal]
-
-    def __hash__(self) -> int:
-        return super().__hash__()
-
-
-@dataclass(kw_only=True)
-class ParseState:
-    action: int
-    value: Node
+class LR0Items:
+    # LR(0) items packed into ints. The items of rule r are numbered from
+    # rule_items[r] to rule_items[r] + len(rhs), one per dot position, so
+    # shifting an item gives item + 1 and shifting a set of items held as
+    # a bitmask shifts the mask left by one.
+    rule_items: list[int]
+    # Rule of each item and index of the symbol after its dot, -1 once
+    # the dot has reached the end
+    item_rules: list[int]
+    item_symbols: list[int]
+    # Per symbol, bitmasks over the items a closure gains from an item
+    # with the dot in front of it, over the symbols those items and the
+    # symbol itself shift, and over the items with the dot in front of it
+    symbol_closures: list[int]
+    symbol_shifts: list[int]
+    symbol_items: list[int]
+    # Bitmask over the items with the dot at the end
+    final_items: int
+    # FIRST of what follows the symbol after the dot, and whether all of
+    # it is nullable
+    item_first: list[int]
+    item_nullable_tail: list[bool]
+
+    def expand(self, kernel: int) -> tuple[int, int]:
+        # Closure of a kernel and the symbols it shifts, as bitmasks
+        closure = kernel
+        shifts = 0
+        item_symbols = self.item_symbols
+        symbol_closures = self.symbol_closures
+        symbol_shifts = self.symbol_shifts
+        for item in bits(kernel):
+            symbol = item_symbols[item]
+            if symbol >= 0:
+                closure |= symbol_closures[symbol]
+                shifts |= symbol_shifts[symbol]
+        return closure, shifts
 
 
 class GrammarMeta[T: Builder, U: Node](type):
+    # Grammars may be used from any number of threads. Symbols and rules
+    # are set up when the class is created, tables and scanners are built
+    # on first use under the grammar's lock, exactly once, and are only
+    # read afterwards. Everything a parse changes lives in its own Parser
+    # and builder.
     _terminals: list[Terminal]
     _nonterminals: list[NonTerminal]
+    _terminals_by_name: dict[str, Terminal]
+    _nonterminals_by_name: dict[str, NonTerminal]
+    _symbols: list[Terminal | NonTerminal] | None
+    _rules: list[Rule] | None
+    _lock: threading.RLock
+    _finalized: bool
+    _finalizing: bool
+    _tables: ParseTables | None
+    _scanner: Scanner | None
+    _contextual_scanners: list[Scanner] | None
+    # Only needed while the tables are built, released once they are
+    _first_sets: list[int] | None
+    _lr0_items: LR0Items | None
 
     def emplace_terminal(
         self,
         name: str,
-        pattern: str | None
+        pattern: str | None,
+        skip: bool = False
     ):
-        for terminal in self._terminals:
-            if terminal.name == name:
-                terminal.pattern = pattern
-                return terminal, False
+        terminal = self._terminals_by_name.get(name)
+        if terminal is not None:
+            terminal.pattern = pattern
+            terminal.skip = skip
+            return terminal, False
 
         terminal = Terminal(
             name=name,
-            pattern=pattern
+            pattern=pattern,
+            skip=skip
         )
         self._terminals.append(terminal)
+        self._terminals_by_name[name] = terminal
+        self._symbols = None
 
         setattr(self, name, terminal)
 
@@ -75,16 +125,18 @@ class GrammarMeta[T: Builder, U: Node](type):
         name: str,
         generated: bool = False
     ):
-        for nonterminal in self._nonterminals:
-            if nonterminal.name == name:
-                assert nonterminal.generated == generated
-                return nonterminal, False
+        nonterminal = self._nonterminals_by_name.get(name)
+        if nonterminal is not None:
+            assert nonterminal.generated == generated
+            return nonterminal, False
 
         nonterminal = NonTerminal(
             name=name,
             generated=generated
         )
         self._nonterminals.append(nonterminal)
+        self._nonterminals_by_name[name] = nonterminal
+        self._symbols = None
 
         setattr(self, name, nonterminal)
 
@@ -204,14 +256,41 @@ class GrammarMeta[T: Builder, U: Node](type):
 
         self._terminals = []
         self._nonterminals = []
+        self._terminals_by_name = {}
+        self._nonterminals_by_name = {}
+        self._symbols = None
+        self._rules = None
+        self._lock = threading.RLock()
+        self._finalized = False
+        self._finalizing = False
+        self._tables = None
+        self._scanner = None
+        self._contextual_scanners = None
+        self._first_sets = None
+        self._lr0_items = None
 
         if not any(isinstance(base, GrammarMeta) for base in bases):
             return
 
-        self.rules = classmethod(cache(self.rules.__func__))  # type: ignore
-
-        _EOF, _ = self.emplace_terminal(name="_EOF", pattern=None)
-        _START, _ = self.emplace_nonterminal(name="_START",)
+        # Class creation only sets up the declared symbols, so that class
+        # attributes resolve to this grammar's own. Rules are expanded by
+        # finalize() when the grammar is first used. They are kept on the
+        # class, a subclass wraps the function its base declared rather
+        # than the base's wrapper.
+        declared = self.rules.__func__  # type: ignore
+        declared = getattr(declared, "__wrapped__", declared)
+
+        def rules(cls: GrammarMeta[T, U]) -> list[Rule]:
+            cls.finalize()
+            if cls._rules is None:
+                cls._rules = declared(cls)
+            return cls._rules
+
+        rules.__wrapped__ = declared  # type: ignore
+        self.rules = classmethod(rules)  # type: ignore
+
+        self.emplace_terminal(name="_EOF", pattern=None)
+        self.emplace_nonterminal(name="_START",)
         for base in bases:
             if not isinstance(base, GrammarMeta):
                 continue
@@ -219,13 +298,15 @@ class GrammarMeta[T: Builder, U: Node](type):
             if base is Grammar:
                 continue
 
-            for terminal in base.terminals():
+            # Not terminals() and nonterminals(), those would finalize base
+            for terminal in base._terminals:
                 self.emplace_terminal(
                     name=terminal.name,
-                    pattern=terminal.pattern
+                    pattern=terminal.pattern,
+                    skip=terminal.skip
                 )
 
-            for nonterminal in base.nonterminals():
+            for nonterminal in base._nonterminals:
                 if nonterminal.generated:
                     continue
 
@@ -237,13 +318,39 @@ class GrammarMeta[T: Builder, U: Node](type):
             if isinstance(value, Terminal):
                 self.emplace_terminal(
                     name=value.name or name,
-                    pattern=value.pattern
+                    pattern=value.pattern,
+                    skip=value.skip
                 )
             elif isinstance(value, NonTerminal):
                 self.emplace_nonterminal(
                     name=value.name or name
                 )
 
+        symbols: list[Terminal | NonTerminal] = self._terminals + self._nonterminals
+        for idx, symbol in enumerate(symbols):
+            symbol.idx = idx
+
+    def finalize(self) -> None:
+        # Expands the rules, which generates the nonterminals of repeats,
+        # and works out which nonterminals are nullable. Runs once, on
+        # first use or warm().
+        if self._finalized:
+            return
+
+        with self._lock:
+            # Set while rules() is collected, which calls rules() itself
+            if self._finalized or self._finalizing:
+                return
+
+            self._finalizing = True
+            try:
+                self.expand_rules()
+            finally:
+                self._finalizing = False
+            self._finalized = True
+
+    def expand_rules(self) -> None:
+        _START = self._nonterminals[0]
         initial_rule = Rule(
             callback=self.builder().noop,
             lhs=_START,
@@ -270,426 +377,732 @@ class GrammarMeta[T: Builder, U: Node](type):
         for idx, symbol in enumerate(self.symbols()):
             symbol.idx = idx
 
-        updated: set[NonTerminal] = set()
-        for nonterminal in self.nonterminals():
-            nonterminal.nullable = not all(nonterminal.rules)
-            if nonterminal.nullable:
-                updated.add(nonterminal)
-
-        while updated:
-            current = updated.pop()
-            for rule in self.rules():
-                if rule.lhs.nullable:
-                    continue
-
-                if rule.rhs != [current]:
-                    continue
-
-                rule.lhs.nullable = True
-                updated.add(rule.lhs)
+        self.mark_nullable(rules)
+
+    def mark_nullable(self, rules: list[Rule]) -> None:
+        # Worklist over the rules each nonterminal occurs in. A rule stands
+        # for its lhs once all of its rhs is known to be nullable, rules
+        # with a terminal in them never do.
+        remaining: list[int] = []
+        occurrences: defaultdict[NonTerminal, list[int]] = defaultdict(list)
+        worklist: list[NonTerminal] = []
+        for rule in rules:
+            if any(isinstance(symbol, Terminal) for symbol in rule.rhs):
+                remaining.append(-1)
+                continue
 
-    @cache
-    def lr0_make_closure(
-        self,
-        symbol: NonTerminal
-    ) -> frozenlist[ClosureItemLR0]:
-        return frozenlist([
-            ClosureItemLR0(rule=rule, position=0)
-            for rule in symbol.rules
-        ])
-
-    @cache
-    def lr0_expand_closure(
-        self,
-        closure: frozenlist[ClosureItemLR0]
-    ) -> frozenlist[ClosureItemLR0]:
-        new_closures: dict[ClosureItemLR0, None] = {}
+            remaining.append(len(rule.rhs))
+            for symbol in rule.rhs:
+                occurrences[cast(NonTerminal, symbol)].append(rule.idx)
+            if not rule.rhs:
+                worklist.append(rule.lhs)
 
-        idx = 0
-        stack: list[ClosureItemLR0] = list(closure)
-        while True:
-            try:
-                item = stack[idx]
-            except IndexError:
-                break
-
-            idx += 1
+        for nonterminal in self._nonterminals:
+            nonterminal.nullable = False
 
-            if item in new_closures:
+        while worklist:
+            current = worklist.pop()
+            if current.nullable:
                 continue
 
-            new_closures.setdefault(item)
+            current.nullable = True
+            for rule_idx in occurrences[current]:
+                remaining[rule_idx] -= 1
+                if remaining[rule_idx] == 0:
+                    worklist.append(rules[rule_idx].lhs)
 
-            try:
-                lhs = item.current()
-            except IndexError:
-                continue
+    def lr0_items(self) -> LR0Items:
+        lr0_items = self._lr0_items
+        if lr0_items is None:
+            lr0_items = self._lr0_items = self.make_lr0_items()
+        return lr0_items
 
-            if isinstance(lhs, NonTerminal):
-                default_closure = self.lr0_make_closure(lhs)
-                stack.extend(default_closure)
+    def make_lr0_items(self) -> LR0Items:
+        rules = self.rules()
+        first = self.first_sets()
+
+        rule_items: list[int] = []
+        item_rules: list[int] = []
+        item_symbols: list[int] = []
+        for rule in rules:
+            rule_items.append(len(item_rules))
+            item_rules.extend([rule.idx] * (len(rule.rhs) + 1))
+            item_symbols.extend(symbol.idx for symbol in cast(list[Symbol], rule.rhs))
+            item_symbols.append(-1)
+
+        item_first = [0] * len(item_rules)
+        item_nullable_tail = [True] * len(item_rules)
+        for rule in rules:
+            tail_first = 0
+            tail_nullable = True
+            for position in reversed(range(len(rule.rhs) + 1)):
+                item = rule_items[rule.idx] + position
+                item_first[item] = tail_first
+                item_nullable_tail[item] = tail_nullable
+
+                if position == len(rule.rhs):
+                    continue
 
-        return frozenlist(new_closures)
+                symbol = rule.rhs[position]
+                assert isinstance(symbol, Symbol)
+                if isinstance(symbol, NonTerminal) and symbol.nullable:
+                    tail_first |= first[symbol.idx]
+                else:
+                    tail_first = first[symbol.idx]
+                    tail_nullable = False
 
-    @cache
-    def lalr_expand_closure(
-        self,
-        closure: frozenlist[ClosureItemCLR],
-    ) -> list[ClosureItemCLR]:
-        lr0_closure = self.lr0_expand_closure(closure)
-        lr_closure_to_idx = {
-            closure: idx
-            for idx, closure
-            in enumerate(lr0_closure)
+        # A nonterminal's closure holds the initial items of its rules and
+        # the closures of the nonterminals those rules start with, likewise
+        # for the symbols it shifts
+        symbols = self.symbols()
+        starts = {
+            nonterminal.idx: [
+                symbol.idx
+                for rule in nonterminal.rules
+                if rule.rhs and isinstance(symbol := rule.rhs[0], NonTerminal)
+            ]
+            for nonterminal in self.nonterminals()
         }
+        def initial_closure(idx: int) -> int:
+            closure = 0
+            for rule in cast(NonTerminal, symbols[idx]).rules:
+                closure |= 1 << rule_items[rule.idx]
+            return closure
+
+        def initial_shifts(idx: int) -> int:
+            shifts = 0
+            for rule in cast(NonTerminal, symbols[idx]).rules:
+                if rule.rhs and isinstance(symbol := rule.rhs[0], Symbol):
+                    shifts |= 1 << symbol.idx
+            return shifts
+
+        nonterminal_closures = digraph(starts, starts, initial_closure)
+        nonterminal_shifts = digraph(starts, starts, initial_shifts)
+
+        symbol_closures = [
+            nonterminal_closures.get(symbol.idx, 0)
+            for symbol in symbols
+        ]
+        symbol_shifts = [
+            1 << symbol.idx | nonterminal_shifts.get(symbol.idx, 0)
+            for symbol in symbols
+        ]
 
-        updated: set[int] = set()
-        lalr_closure: list[ClosureItemCLR] = []
-        for idx, item in enumerate(lr0_closure):
-            try:
-                lookahead = closure[idx].lookahead
-            except IndexError:
-                lookahead = frozenset[Terminal]()
-
-            lalr_closure.append(
-                ClosureItemCLR(
-                    rule=item.rule,
-                    position=item.position,
-                    lookahead=lookahead
-                )
-            )
+        symbol_items = [0] * len(symbols)
+        final_items = 0
+        for item, symbol_idx in enumerate(item_symbols):
+            if symbol_idx < 0:
+                final_items |= 1 << item
+            else:
+                symbol_items[symbol_idx] |= 1 << item
+
+        return LR0Items(
+            rule_items=rule_items,
+            item_rules=item_rules,
+            item_symbols=item_symbols,
+            symbol_closures=symbol_closures,
+            symbol_shifts=symbol_shifts,
+            symbol_items=symbol_items,
+            final_items=final_items,
+            item_first=item_first,
+            item_nullable_tail=item_nullable_tail
+        )
 
-            try:
-                item.current()
-                updated.add(idx)
-            except IndexError:
-                pass
+    def lalr_expand_kernel(
+        self,
+        kernel: int,
+        lookaheads: list[int]
+    ) -> tuple[list[int], list[int]]:
+        # Closure of kernel as an ascending list of items with the
+        # lookahead of each. Kernel items start out with lookaheads, in
+        # ascending order, and every item spreads FIRST of what follows its
+        # nonterminal, plus its own lookahead where all of that is nullable,
+        # to the initial items of that nonterminal.
+        items = self.lr0_items()
+        symbols = self.symbols()
+        terminal_count = len(self._terminals)
+        rule_items = items.rule_items
+        item_symbols = items.item_symbols
+        item_first = items.item_first
+        item_nullable_tail = items.item_nullable_tail
 
-        while updated:
-            item = lalr_closure[updated.pop()]
+        closure_mask, _ = items.expand(kernel)
+        closure = list(bits(closure_mask))
+        positions = {item: idx for idx, item in enumerate(closure)}
 
-            try:
-                current_symbol: NonTerminal | Terminal = item.current()
-            except IndexError:
-                continue
+        lookahead = [0] * len(closure)
+        for item, kernel_lookahead in zip(bits(kernel), lookaheads):
+            lookahead[positions[item]] = kernel_lookahead
 
-            if isinstance(current_symbol, Terminal):
+        updated = list(range(len(closure)))
+        while updated:
+            idx = updated.pop()
+            item = closure[idx]
+            symbol = item_symbols[item]
+            if symbol < terminal_count:
                 continue
 
-            follow = self.follow(item)
-            for lr0_item in self.lr0_make_closure(current_symbol):
-                item_idx = lr_closure_to_idx[lr0_item]
-                lalr_item = lalr_closure[item_idx]
-
-                old_lookahead = lalr_item.lookahead
-                new_lookahead = lalr_item.lookahead | follow
-
-                if len(old_lookahead) != len(new_lookahead):
-                    lalr_closure[item_idx] = ClosureItemCLR(
-                        rule=lalr_item.rule,
-                        position=lalr_item.position,
-                        lookahead=new_lookahead
-                    )
-                    updated.add(item_idx)
-
-        return lalr_closure
+            follow = item_first[item]
+            if item_nullable_tail[item]:
+                follow |= lookahead[idx]
 
-    def lalr_make_automaton(self) -> NDArray[np.int16]:
-        rules = self.rules()
-
-        initial_lalr_closure = self.lalr_expand_closure(
-            frozenlist([
-                ClosureItemCLR(
-                    rule=rules[0],
-                    position=0,
-                    lookahead=frozenset({
-                        self._terminals[0]
-                    })
-                )
-            ])
-        )
-
-        def slice_closure(
-            closure: list[ClosureItemCLR]
-        ) -> frozenlist[ClosureItemLR0]:
-            return frozenlist(
-                ClosureItemLR0(
-                    rule=item.rule,
-                    position=item.position
-                )
-                for item in closure
-            )
-
-        default_state = [0] * len(self.symbols())
+            for rule in cast(NonTerminal, symbols[symbol]).rules:
+                target = positions[rule_items[rule.idx]]
+                if lookahead[target] | follow != lookahead[target]:
+                    lookahead[target] |= follow
+                    updated.append(target)
 
-        closures = [initial_lalr_closure]
-        closure_to_idx = {slice_closure(initial_lalr_closure): 0}
+        return closure, lookahead
 
-        automaton: dict[int, list[int]] = defaultdict(default_state.copy)
-
-        updated: set[int] = {0}
+    def lalr_make_automaton(
+        self,
+        engine: LalrEngine = "deremer-pennello"
+    ) -> NDArray[np.intc]:
+        match engine:
+            case "iterative":
+                return self.lalr_make_automaton_iterative()
+            case "deremer-pennello":
+                return self.lalr_make_automaton_relations()
+        raise ValueError(f"Unknown LALR engine: {engine!r}")
+
+    def lalr_make_automaton_iterative(self) -> NDArray[np.intc]:
+        # Canonical LR(1) closures merged per LR(0) kernel, lookaheads are
+        # spread by revisiting states until none of them changes
+        items = self.lr0_items()
+        item_rules = items.item_rules
+        item_symbols = items.item_symbols
+        symbol_count = len(self.symbols())
+
+        initial_kernel = 1 << items.rule_items[0]
+        initial_lookaheads = [1 << self._terminals[0].idx]
+        closure, lookahead = self.lalr_expand_kernel(initial_kernel, initial_lookaheads)
+
+        kernel_lookaheads = [initial_lookaheads]
+        closures = [closure]
+        lookaheads = [lookahead]
+        kernel_to_idx = {initial_kernel: 0}
+        automaton = [[0] * symbol_count]
+
+        # States are processed first-in first-out and their successors are
+        # visited by symbol, so states are numbered in the same order as in
+        # lr0_make_automaton()
+        updated: deque[int] = deque([0])
+        queued: set[int] = {0}
         while updated:
-            current_closure_idx = updated.pop()
-            current_closure = closures[current_closure_idx]
-
-            symbol_to_shift: defaultdict[Symbol, list[ClosureItemCLR]] = defaultdict(list)
-            symbol_to_reduce: defaultdict[Terminal, list[Rule]] = defaultdict(list)
-            for item in current_closure:
-                try:
-                    symbol = item.current()
-                    shift_closure = symbol_to_shift[symbol]
-                    symbol_to_shift[symbol]
-                    shift_closure.append(
-                        ClosureItemCLR(
-                            rule=item.rule,
-                            position=item.position + 1,
-                            lookahead=item.lookahead
-                        )
-                    )
-                except IndexError:
-                    for symbol in item.lookahead:
-                        symbol_to_reduce[symbol].append(item.rule)
-
-            state = automaton[current_closure_idx]
-            for symbol, rules in symbol_to_reduce.items():
-                assert len(rules) == 1
-                rule, = rules
-
-                next_state = state[symbol.idx]
-                if next_state < 0:
-                    assert next_state == -rule.idx - 1
-                elif next_state == 0:
-                    state[symbol.idx] = -rule.idx - 1
-
-            for symbol, closure in symbol_to_shift.items():
-                closure = self.lalr_expand_closure(frozenlist(closure))
-                closure_idx = closure_to_idx.setdefault(
-                    slice_closure(closure),
-                    len(closure_to_idx)
-                )
-                if closure_idx == len(closures):
+            state = updated.popleft()
+            queued.remove(state)
+            row = automaton[state]
+
+            shifts: dict[int, tuple[int, list[int]]] = {}
+            symbol_to_reduce: defaultdict[int, list[int]] = defaultdict(list)
+            for item, item_lookahead in zip(closures[state], lookaheads[state]):
+                symbol = item_symbols[item]
+                if symbol < 0:
+                    for terminal_idx in bits(item_lookahead):
+                        symbol_to_reduce[terminal_idx].append(item_rules[item])
+                    continue
+
+                kernel, shifted_lookaheads = shifts.get(symbol, (0, []))
+                shifted_lookaheads.append(item_lookahead)
+                shifts[symbol] = kernel | 1 << item + 1, shifted_lookaheads
+
+            for terminal_idx, reduce_rules in symbol_to_reduce.items():
+                assert len(reduce_rules) == 1
+                rule_idx, = reduce_rules
+
+                action = row[terminal_idx]
+                if action < 0:
+                    assert action == -rule_idx - 1
+                elif action == 0:
+                    row[terminal_idx] = -rule_idx - 1
+
+            for symbol in sorted(shifts):
+                kernel, shifted_lookaheads = shifts[symbol]
+                target = kernel_to_idx.setdefault(kernel, len(closures))
+                if target == len(closures):
+                    closure, lookahead = self.lalr_expand_kernel(kernel, shifted_lookaheads)
+                    kernel_lookaheads.append(shifted_lookaheads)
                     closures.append(closure)
-                    updated.add(closure_idx)
+                    lookaheads.append(lookahead)
+                    automaton.append([0] * symbol_count)
+                    updated.append(target)
+                    queued.add(target)
                 else:
-                    needs_update = False
-                    for idx, (old_item, new_item) in enumerate(
-                        zip(
-                            closures[closure_idx],
-                            closure
-                        )
-                    ):
-                        new_lookahead = old_item.lookahead | new_item.lookahead
-
-                        closures[closure_idx][idx] = ClosureItemCLR(
-                            rule=old_item.rule,
-                            position=old_item.position,
-                            lookahead=new_lookahead
-                        )
-
-                        needs_update |= len(new_lookahead) != len(old_item.lookahead)
-
-                    if needs_update:
-                        updated.add(closure_idx)
-
-                state[symbol.idx] = closure_idx + 1
-
-        return np.vstack(tuple(automaton.values()))
-
-    def parse(self, text: str, builder: T | None = None) -> U:
-        if builder is None:
-            builder = self.builder()()
-
-        eof_token = Token(
-            start=len(text),
-            stop=len(text),
-            text="$",
-            type=self._terminals[0]
-        )
-        tokens = self.tokenize(text)
-
-        automaton = self.lalr_make_automaton()
-        rules = self.rules()
-
-        stack: list[ParseState] = [
-            ParseState(
-                action=1,
-                value=Node(start=0, stop=0)
-            )
+                    # The closure only changes when the kernel's lookaheads do
+                    merged = [
+                        old | new
+                        for old, new in zip(kernel_lookaheads[target], shifted_lookaheads)
+                    ]
+                    if merged != kernel_lookaheads[target]:
+                        kernel_lookaheads[target] = merged
+                        _, lookaheads[target] = self.lalr_expand_kernel(kernel, merged)
+                        if target not in queued:
+                            updated.append(target)
+                            queued.add(target)
+
+                row[symbol] = target + 1
+
+        return np.array(automaton, dtype=np.intc)
+
+    def lr0_make_automaton(self) -> tuple[list[int], list[dict[int, int]]]:
+        # Closures as bitmasks over items, transitions map symbol indices
+        # to target states. Kernels are bitmasks too, the kernel reached
+        # on a symbol is the closure's items in front of it shifted by one.
+        items = self.lr0_items()
+        symbol_items = items.symbol_items
+
+        kernels = [1 << items.rule_items[0]]
+        kernel_to_idx = {kernels[0]: 0}
+        closures: list[int] = []
+        transitions: list[dict[int, int]] = []
+
+        # Breadth-first, so states end up numbered in discovery order
+        for kernel in kernels:
+            closure, shifts = items.expand(kernel)
+
+            transition: dict[int, int] = {}
+            for symbol in bits(shifts):
+                target_kernel = (closure & symbol_items[symbol]) << 1
+                target = kernel_to_idx.setdefault(target_kernel, len(kernels))
+                if target == len(kernels):
+                    kernels.append(target_kernel)
+                transition[symbol] = target
+
+            closures.append(closure)
+            transitions.append(transition)
+
+        return closures, transitions
+
+    def lalr_make_automaton_relations(self) -> NDArray[np.intc]:
+        # Lookaheads are computed over the LR(0) automaton with the
+        # reads/includes/lookback relations from DeRemer & Pennello,
+        # "Efficient Computation of LALR(1) Look-Ahead Sets"
+        symbols = self.symbols()
+        items = self.lr0_items()
+        rule_items = items.rule_items
+        item_rules = items.item_rules
+        item_symbols = items.item_symbols
+        item_nullable_tail = items.item_nullable_tail
+
+        eof = 1 << self._terminals[0].idx
+        terminal_count = len(self._terminals)
+        nullable = [
+            isinstance(symbol, NonTerminal) and symbol.nullable
+            for symbol in symbols
+        ]
+        closures, transitions = self.lr0_make_automaton()
+
+        # Nonterminal transitions are the nodes of both the reads and the
+        # includes relations, numbered state * symbol_count + nonterminal
+        symbol_count = len(symbols)
+        goto_nodes: list[int] = [
+            state * symbol_count + symbol
+            for state, transition in enumerate(transitions)
+            for symbol in transition
+            if symbol >= terminal_count
         ]
-        while True:
-            try:
-                token = tokens.pop(0)
-            except IndexError:
-                token = eof_token
-
-            action: int = automaton[stack[-1].action - 1, token.type.idx]
-            if action == 0:
-                state = automaton[stack[-1].action - 1]
-                state = np.reshape(state, [-1])
-                state = cast(list[int], np.flatnonzero(state))
-                symbols = self.symbols()
-                terminals: list[str] = [
-                    symbols[idx].name
-                    for idx in state
-                    if isinstance(symbols[idx], Terminal)
-                ]
-                expectation = ", ".join(terminals)
-                raise ParseError(
-                    f"Unexpected token: {token.text!r} ({token.type.name}), "
-                    f"expected one of: {expectation}"
-                )
-
-            if action > 0:
-                stack.append(
-                    ParseState(
-                        action=action,
-                        value=token
-                    )
-                )
-
-            try:
-                token = tokens[0]
-            except IndexError:
-                token = eof_token
-
-            while (action := automaton[stack[-1].action - 1, token.type.idx]) < 0:
-                if action == -1:
-                    # TODO@Daniel:
-                    #   Allow for partial parsing
-                    assert token.type.idx == 0
-                    return cast(U, stack[-1].value)
-
-                rule = rules[-action - 1]
-
-                start_idx = len(stack) - len(rule.rhs)
-                stop_idx = len(stack)
-                arg_stack = stack[start_idx:stop_idx]
-                del stack[start_idx:stop_idx]
-
-                arguments = [
-                    arg_stack[idx].value
-                    for idx in rule.parameter_indices
-                ]
 
-                if arg_stack:
-                    start = arg_stack[0].value.start
-                    stop = arg_stack[-1].value.stop
+        def direct_reads(node: int) -> int:
+            state, symbol = divmod(node, symbol_count)
+            target = transitions[state][symbol]
+
+            terminals = 0
+            for next_symbol in transitions[target]:
+                if next_symbol < terminal_count:
+                    terminals |= 1 << next_symbol
+            return terminals
+
+        reads: defaultdict[int, list[int]] = defaultdict(list)
+        for node in goto_nodes:
+            state, symbol = divmod(node, symbol_count)
+            target = transitions[state][symbol]
+            for next_symbol in transitions[target]:
+                if nullable[next_symbol]:
+                    reads[node].append(target * symbol_count + next_symbol)
+
+        read_sets = digraph(goto_nodes, reads, direct_reads)
+
+        # Reductions are looked back on per state * rule_count + rule
+        rule_count = len(rule_items)
+        includes: defaultdict[int, list[int]] = defaultdict(list)
+        lookback: defaultdict[int, list[int]] = defaultdict(list)
+        for node in goto_nodes:
+            state, symbol = divmod(node, symbol_count)
+            for rule in cast(NonTerminal, symbols[symbol]).rules:
+                current = state
+                item = rule_items[rule.idx]
+                while (rhs_symbol := item_symbols[item]) >= 0:
+                    if rhs_symbol >= terminal_count and item_nullable_tail[item]:
+                        includes[current * symbol_count + rhs_symbol].append(node)
+
+                    current = transitions[current][rhs_symbol]
+                    item += 1
+
+                lookback[current * rule_count + rule.idx].append(node)
+
+        # There is no goto on _START, it is only ever followed by EOF
+        start_follow: set[int] = set()
+
+        current = 0
+        item = rule_items[0]
+        while (rhs_symbol := item_symbols[item]) >= 0:
+            if rhs_symbol >= terminal_count and item_nullable_tail[item]:
+                start_follow.add(current * symbol_count + rhs_symbol)
+            current = transitions[current][rhs_symbol]
+            item += 1
+
+        def initial_follow(node: int) -> int:
+            follow = read_sets[node]
+            if node in start_follow:
+                follow |= eof
+            return follow
+
+        follow_sets = digraph(goto_nodes, includes, initial_follow)
+
+        # Actions are gathered by flat index and written in bulk, shifts
+        # last as they win over reductions. Lookaheads with many terminals
+        # are written a row at a time.
+        automaton = np.zeros((len(closures), symbol_count), dtype=np.intc)
+        reduce_cells: list[int] = []
+        reduce_actions: list[int] = []
+        shift_cells: list[int] = []
+        shift_actions: list[int] = []
+        for state, closure in enumerate(closures):
+            offset = state * symbol_count
+
+            reduced = 0
+            for item in bits(closure & items.final_items):
+                rule_idx = item_rules[item]
+                if rule_idx == 0:
+                    lookahead = eof
                 else:
-                    start = stack[-1].value.stop
-                    stop = token.start
-
-                result = rule.callback(
-                    builder,
-                    start,
-                    stop,
-                    *arguments
-                )
+                    lookahead = 0
+                    for node in lookback[state * rule_count + rule_idx]:
+                        lookahead |= follow_sets[node]
 
-                action = automaton[stack[-1].action - 1, rule.lhs.idx]
-                assert action > 0
+                assert not reduced & lookahead
+                reduced |= lookahead
 
-                stack.append(
-                    ParseState(
-                        action=action,
-                        value=result
-                    )
-                )
+                if lookahead.bit_count() > 16:
+                    automaton[state, :terminal_count][bit_array(lookahead, terminal_count)] = -rule_idx - 1
+                    continue
 
-    @cache
-    def follow(
-        self,
-        item: ClosureItemCLR
-    ) -> frozenset[Terminal]:
-        right = cast(
-            list[Terminal | NonTerminal],
-            item.rule.rhs[item.position + 1:]
+                for terminal_idx in bits(lookahead):
+                    reduce_cells.append(offset + terminal_idx)
+                    reduce_actions.append(-rule_idx - 1)
+
+            for symbol, target in transitions[state].items():
+                shift_cells.append(offset + symbol)
+                shift_actions.append(target + 1)
+
+        cells = automaton.reshape(-1)
+        cells[reduce_cells] = reduce_actions
+        cells[shift_cells] = shift_actions
+        return automaton
+
+    def tables(self) -> ParseTables:
+        if self._tables is not None:
+            return self._tables
+
+        with self._lock:
+            if self._tables is None:
+                self._tables = self.make_tables()
+                self.release_build_state()
+        return self._tables
+
+    def make_tables(self) -> ParseTables:
+        automaton = self.make_automaton()
+
+        directory = self.cache_dir()
+        layout = self.table_layout()
+        buffer = None
+        if layout == "shared" and directory is not None:
+            buffer = map_table(self, directory, automaton)
+
+        return ParseTables.from_automaton(
+            automaton,
+            self.terminals(),
+            self.rules(),
+            layout=layout,
+            buffer=buffer
         )
-        if not right:
-            return item.lookahead
-
-        follow: set[Terminal] = set()
-        while right:
-            current = right[0]
-            if not isinstance(current, NonTerminal):
-                break
 
-            if not current.nullable:
-                break
-
-            follow.update(self.first(right.pop(0)))
+    def make_automaton(self) -> NDArray[np.integer]:
+        automaton = None
+
+        directory = self.cache_dir()
+        if directory is not None:
+            automaton = load_automaton(self, directory)
+
+        if automaton is None:
+            automaton = self.lalr_make_automaton()
+
+            if directory is not None:
+                store_automaton(self, directory, automaton)
+
+        return automaton
+
+    def automaton(self) -> NDArray[np.integer]:
+        # The dense automaton whatever the table layout. The compressed
+        # layout does not keep it, it is loaded from the disk cache or
+        # built again on every call.
+        automaton = self.tables().automaton
+        if automaton is not None:
+            return automaton
+
+        with self._lock:
+            automaton = self.make_automaton()
+            self.release_build_state()
+        return automaton
+
+    def release_build_state(self) -> None:
+        # The tables hold everything parsing needs. Whatever else was
+        # computed to build them is computed again if anything asks.
+        self._first_sets = None
+        self._lr0_items = None
+
+    def memory_report(self) -> dict[str, int]:
+        # Bytes held by the grammar, by what holds them: rules and symbols,
+        # parse tables, scanners, and state left over from building the
+        # tables. Anything shared is counted once, under the first of these.
+        # Reads the grammar as it is without finalizing or building
+        # anything, rules not collected yet count as 0 like everything else
+        # not built yet.
+        seen: set[int] = set()
+        return {
+            "rules": (
+                deep_sizeof(self._rules, seen) +
+                deep_sizeof(self._terminals, seen) +
+                deep_sizeof(self._nonterminals, seen)
+            ),
+            "tables": deep_sizeof(self._tables, seen),
+            "scanners": (
+                deep_sizeof(self._scanner, seen) +
+                deep_sizeof(self._contextual_scanners, seen)
+            ),
+            "build": (
+                deep_sizeof(self._first_sets, seen) +
+                deep_sizeof(self._lr0_items, seen)
+            )
+        }
 
-        if right:
-            follow.update(self.first(right.pop(0)))
-        else:
-            follow.update(item.lookahead)
+    def warm(self) -> None:
+        self.finalize()
+        self.tables()
+        self.scanner()
+        if self.contextual_lexing():
+            self.contextual_scanners()
+
+    def generate_module(self, path: str | PathLike[str]) -> None:
+        Path(path).write_text(generate_module(self))
+
+    def parse(self, text: Source, builder: T | None = None) -> U:
+        # Bytes-like text is scanned with ASCII semantics, see Source,
+        # decode it first where non-ASCII characters must match \w and alike
+        text = as_source(text)
+
+        parser = self.parser(builder)
+        return parser.consume(parser.tokens(text))
+
+    def parser(self, builder: T | None = None, documents: bool = False) -> Parser[T, U]:
+        return Parser(self, builder, documents)
+
+    def parse_buffer(self, buffer: TokenBuffer, builder: T | None = None) -> U:
+        # parse() over a TokenBuffer, terminals sit on the value stack as
+        # buffer indices and only become Tokens when a callback takes them
+        parser = self.parser(builder)
+        return parser.consume(parser.indices(buffer))
+
+    def parse_file(self, path: str | PathLike[str], builder: T | None = None) -> U:
+        # The file is memory mapped and scanned as bytes, tokens decode
+        # their text from the mapping when it is read. The mapping stays
+        # open for as long as any token refers to it.
+        with open(path, "rb") as file:
+            try:
+                source: Source = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files cannot be mapped
+                source = b""
+        return self.parse(source, builder)
 
-        return frozenset(follow)
+    async def parse_async(
+        self,
+        stream: asyncio.StreamReader | AsyncIterable[Source],
+        builder: T | None = None,
+        tokens_per_step: int = 4096,
+        chunk_size: int = 65536
+    ) -> U:
+        # Reads a StreamReader chunk_size bytes at a time, or takes the
+        # chunks of any other async iterable as they come
+        return await parse_async(self.parser(builder), stream, tokens_per_step, chunk_size)
+
+    def iter_documents(
+        self,
+        stream: Source | IO[Any] | Iterable[Source],
+        builder: T | None = None,
+        chunk_size: int = 65536
+    ) -> Iterator[U]:
+        # Documents written back to back, such as JSON Lines, are parsed in
+        # one pass with one parser. stream is text, a file read chunk_size
+        # at a time, or any iterable of chunks like the lines of a file.
+        return iter_documents(self.parser(builder, documents=True), stream, chunk_size)
+
+    def parse_many[V](
+        self,
+        texts: Iterable[Source],
+        workers: int | None = None,
+        transform: Transform[U, V] | None = None,
+        batch_size: int = 65536,
+        mp_context: BaseContext | None = None
+    ) -> Iterator[U | V]:
+        # Parses independent documents over a pool of worker processes,
+        # yielding transform(result) for each in order. The grammar and
+        # transform are pickled by reference and must be importable.
+        return parse_many(self, texts, workers, transform, batch_size, mp_context)
 
-    @cache
     def first(
         self,
         symbol: Terminal | NonTerminal
-    ) -> frozenset[Terminal]:
-        if isinstance(symbol, Terminal):
-            return frozenset({symbol})
-
-        closure = self.lr0_make_closure(symbol)
-        closure = self.lr0_expand_closure(closure)
-
-        terminals: set[Terminal] = set()
-        for item in closure:
-            if not item.rule.rhs:
-                continue
-
-            first = item.rule.rhs[0]
-            if not isinstance(first, Terminal):
-                continue
-
-            terminals.add(first)
+    ) -> int:
+        return self.first_sets()[symbol.idx]
+
+    def first_sets(self) -> list[int]:
+        # Read once, release_build_state() may run in another thread
+        first_sets = self._first_sets
+        if first_sets is None:
+            first_sets = self._first_sets = self.make_first_sets()
+        return first_sets
+
+    def make_first_sets(self) -> list[int]:
+        # FIRST of every symbol by index. A nonterminal's set flows into
+        # the lhs of every rule it starts, after any nullable prefix, and
+        # only nonterminals whose set grew are visited again.
+        symbols = self.symbols()
+        first = [
+            1 << symbol.idx if isinstance(symbol, Terminal) else 0
+            for symbol in symbols
+        ]
 
-        return frozenset(terminals)
+        starts: defaultdict[int, set[int]] = defaultdict(set)
+        for rule in self.rules():
+            for symbol in rule.rhs:
+                if isinstance(symbol, Terminal):
+                    first[rule.lhs.idx] |= 1 << symbol.idx
+                    break
+
+                assert isinstance(symbol, NonTerminal)
+                starts[symbol.idx].add(rule.lhs.idx)
+                if not symbol.nullable:
+                    break
+
+        worklist = [idx for idx in starts if first[idx]]
+        while worklist:
+            idx = worklist.pop()
+            for lhs in starts[idx]:
+                grown = first[lhs] | first[idx]
+                if grown != first[lhs]:
+                    first[lhs] = grown
+                    worklist.append(lhs)
+
+        return first
 
     def terminals(self) -> list[Terminal]:
+        self.finalize()
         return self._terminals
 
     def nonterminals(self) -> list[NonTerminal]:
+        self.finalize()
         return self._nonterminals
 
     def symbols(self) -> list[Terminal | NonTerminal]:
-        return self._terminals + self._nonterminals
+        self.finalize()
+        if self._symbols is None:
+            self._symbols = self._terminals + self._nonterminals
+        return self._symbols
 
-    def tokenize(self, text: str) -> list[Token]:
-        regexes = [
-            f"(?P<_{terminal.idx}>{terminal.pattern})"
-            for terminal in self.terminals()
-            if terminal.pattern is not None
-        ]
-        gigaregex = "|".join(regexes)
+    @overload
+    def tokenize(self, text: Source, compact: Literal[False] = False) -> list[Token]:
+        pass
 
-        symbols = self.symbols()
+    @overload
+    def tokenize(self, text: Source, compact: Literal[True]) -> TokenBuffer:
+        pass
 
-        def make_token(match: Match[str]) -> Token:
-            for key, value in match.groupdict().items():
-                if value is None:
-                    continue
+    def tokenize(self, text: Source, compact: bool = False) -> list[Token] | TokenBuffer:
+        if compact:
+            return TokenBuffer.from_spans(
+                text,
+                self.terminals(),
+                self.scanner().spans(text)
+            )
+        return list(self.iter_tokens(text))
 
-                return Token(
-                    start=match.start(),
-                    stop=match.end(),
-                    text=value,
-                    type=symbols[int(key[1:])]
+    def iter_tokens(self, text: Source) -> Iterator[Token]:
+        return self.scanner().scan(text)
+
+    def iter_contextual_tokens(
+        self,
+        text: Source,
+        states: list[int]
+    ) -> Iterator[Token]:
+        # Only the terminals the parser can act on in the state on top of
+        # states are tried, the stack is read again for every token
+        scanner = self.scanner()
+        scanners = self.contextual_scanners()
+
+        position = 0
+        while position < len(text):
+            terminal, stop, _ = scanners[states[-1]].munch(text, position)
+            if terminal is None:
+                # Whatever the full scanner finds here is a syntax error,
+                # which the parser reports when it cannot act on it
+                terminal, stop, _ = scanner.munch(text, position)
+
+            if terminal is None:
+                raise unmatched(text, position)
+
+            if not terminal.skip:
+                yield Token(
+                    start=position,
+                    stop=stop,
+                    source=text,
+                    type=terminal
                 )
-            assert False
+            position = stop
+
+    def contextual_scanners(self) -> list[Scanner]:
+        if self._contextual_scanners is not None:
+            return self._contextual_scanners
+
+        with self._lock:
+            if self._contextual_scanners is None:
+                scanner = self.scanner()
+                self._contextual_scanners = [
+                    scanner.restrict(expected)
+                    for expected in self.tables().expected
+                ]
+        return self._contextual_scanners
 
-        iterable = cast(
-            Iterable[Match[str]],
-            regex.finditer(
-                gigaregex,
-                text,
-                flags=VERSION1
-            )
-        )
-        return list(map(make_token, iterable))
+    def scanner(self) -> Scanner:
+        if self._scanner is not None:
+            return self._scanner
+
+        with self._lock:
+            if self._scanner is None:
+                self._scanner = make_scanner(self.terminals(), self.lexer())
+        return self._scanner
+
+    def cache_dir(self) -> Path | None:
+        return default_cache_dir()
+
+    def table_layout(self) -> TableLayout:
+        return "dense"
+
+    def lexer(self) -> LexerKind:
+        return "dfa"
+
+    def contextual_lexing(self) -> bool:
+        return False
 
     @abstractmethod
     def rules(self) -> list[Rule]:
@@ -707,11 +1120,72 @@ class GrammarMeta[T: Builder, U: Node](type):
         yield from self.symbols()
 
 
+def as_meta[T: Builder, U: Node](grammar: type[Grammar[T, U]]) -> GrammarMeta[T, U]:
+    # Grammar classes are GrammarMeta instances, which type checkers do
+    # not infer from the metaclass
+    return cast(GrammarMeta[T, U], grammar)
+
+
 class Grammar[T: Builder, U: Node](metaclass=GrammarMeta):
     @classmethod
     def builder(cls) -> type[T]:
-        return GrammarMeta.builder(cls)
+        return GrammarMeta.builder(as_meta(cls))
+
+    @classmethod
+    def parse(cls, text: Source, builder: T | None = None) -> U:
+        return GrammarMeta.parse(as_meta(cls), text, builder=builder)
+
+    @classmethod
+    def parser(cls, builder: T | None = None, documents: bool = False) -> Parser[T, U]:
+        return GrammarMeta.parser(as_meta(cls), builder=builder, documents=documents)
+
+    @classmethod
+    def parse_file(cls, path: str | PathLike[str], builder: T | None = None) -> U:
+        return GrammarMeta.parse_file(as_meta(cls), path, builder=builder)
+
+    @classmethod
+    async def parse_async(
+        cls,
+        stream: asyncio.StreamReader | AsyncIterable[Source],
+        builder: T | None = None,
+        tokens_per_step: int = 4096,
+        chunk_size: int = 65536
+    ) -> U:
+        return await GrammarMeta.parse_async(
+            as_meta(cls),
+            stream,
+            builder=builder,
+            tokens_per_step=tokens_per_step,
+            chunk_size=chunk_size
+        )
+
+    @classmethod
+    def iter_documents(
+        cls,
+        stream: Source | IO[Any] | Iterable[Source],
+        builder: T | None = None,
+        chunk_size: int = 65536
+    ) -> Iterator[U]:
+        return GrammarMeta.iter_documents(as_meta(cls), stream, builder=builder, chunk_size=chunk_size)
+
+    @classmethod
+    def parse_many[V](
+        cls,
+        texts: Iterable[Source],
+        workers: int | None = None,
+        transform: Transform[U, V] | None = None,
+        batch_size: int = 65536,
+        mp_context: BaseContext | None = None
+    ) -> Iterator[U | V]:
+        return GrammarMeta.parse_many(
+            as_meta(cls),
+            texts,
+            workers=workers,
+            transform=transform,
+            batch_size=batch_size,
+            mp_context=mp_context
+        )
 
     @classmethod
-    def parse(cls, text: str, builder: T | None = None) -> U:
-        return GrammarMeta.parse(cls, text, builder=builder)
+    def parse_buffer(cls, buffer: TokenBuffer, builder: T | None = None) -> U:
+        return GrammarMeta.parse_buffer(as_meta(cls), buffer, builder=builder)
@@ -1,10 +1,118 @@
 from __future__ import annotations
 
-from typing import TypeVar
+import mmap
+import sys
+import types
 
-T = TypeVar("T")
+from typing import Callable, Iterable, Iterator, Mapping
 
+import numpy as np
 
-class frozenlist(list[T]):
-    def __hash__(self) -> int:  # type: ignore
-        return hash(tuple(self))
+from numpy.typing import NDArray
+
+
+def bits(mask: int) -> Iterator[int]:
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def bit_array(mask: int, size: int) -> NDArray[np.bool_]:
+    # The first size bits of mask as booleans, for masks with too many
+    # bits set to go through one at a time
+    data = np.frombuffer(mask.to_bytes((size + 7) // 8, "little"), dtype=np.uint8)
+    return np.unpackbits(data, count=size, bitorder="little").view(np.bool_)
+
+
+def deep_sizeof(root: object, seen: set[int]) -> int:
+    # Bytes held by root and everything reachable from it that is not in
+    # seen yet, seen is updated so that later calls skip what this one
+    # counted. Classes, functions and modules belong to the program and
+    # are not followed. Arrays count the data they own, mappings their
+    # length.
+    size = 0
+    stack = [root]
+    while stack:
+        obj = stack.pop()
+        if obj is None or id(obj) in seen:
+            continue
+        if isinstance(obj, type | types.FunctionType | types.BuiltinFunctionType | types.MethodType | types.ModuleType):
+            continue
+        seen.add(id(obj))
+
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, list | tuple | set | frozenset):
+            stack.extend(obj)
+        elif isinstance(obj, np.ndarray):
+            stack.append(obj.base)
+        elif isinstance(obj, memoryview):
+            stack.append(obj.obj)
+        elif isinstance(obj, mmap.mmap):
+            size += len(obj)
+        else:
+            if hasattr(obj, "__dict__"):
+                stack.append(vars(obj))
+            for cls in type(obj).__mro__:
+                for slot in getattr(cls, "__slots__", ()):
+                    stack.append(getattr(obj, slot, None))
+
+    return size
+
+
+def digraph[K](
+    nodes: Iterable[K],
+    relation: Mapping[K, Iterable[K]],
+    initial: Callable[[K], int]
+) -> dict[K, int]:
+    # DeRemer & Pennello's digraph algorithm, computes
+    #   F(x) = initial(x) | union(F(y) for y where x R y)
+    # collapsing strongly connected components along the way
+    done = sys.maxsize
+
+    result: dict[K, int] = {}
+    depth: dict[K, int] = {}
+    stack: list[K] = []
+    work: list[tuple[K, int, Iterator[K]]] = []
+
+    def push(x: K) -> None:
+        stack.append(x)
+        depth[x] = len(stack)
+        result[x] = initial(x)
+        work.append((x, len(stack), iter(relation.get(x, ()))))
+
+    for node in nodes:
+        if node in depth:
+            continue
+
+        push(node)
+        while work:
+            x, d, edges = work[-1]
+
+            for y in edges:
+                if y not in depth:
+                    push(y)
+                    break
+
+                depth[x] = min(depth[x], depth[y])
+                result[x] |= result[y]
+            else:
+                work.pop()
+
+                if depth[x] == d:
+                    while True:
+                        top = stack.pop()
+                        depth[top] = done
+                        result[top] = result[x]
+                        if top == x:
+                            break
+
+                if work:
+                    parent = work[-1][0]
+                    depth[parent] = min(depth[parent], depth[x])
+                    result[parent] |= result[x]
+
+    return result
@@ -88,6 +88,8 @@ class Jizz(Grammar[JizzBuilder, ExpressionList]):
     LIT_F32 = Terminal(pattern=r"(\d+.\d+|\d+.|.\d+|\d+)f32")
     LIT_F64 = Terminal(pattern=r"(\d+.\d+|\d+.|.\d+|\d+)f64")
 
+    WHITESPACE = Terminal(pattern=r"\s+", skip=True)
+
     expression_list = NonTerminal()
     non_empty_expression_list = NonTerminal()
     expression = NonTerminal()
@@ -109,6 +111,10 @@ class Jizz(Grammar[JizzBuilder, ExpressionList]):
     curly_block = NonTerminal()
     base_expression = NonTerminal()
 
+    @classmethod
+    def builder(cls) -> type[JizzBuilder]:
+        return cls.BUILDER
+
     @classmethod
     def start(cls) -> NonTerminal:
         return cls.expression_list
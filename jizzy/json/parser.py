@@ -1,6 +1,7 @@
 from __future__ import annotations
-from typing import cast
+from typing import Any, IO, Iterable, Iterator, cast
 
+from jizzy.common import Source
 from jizzy.grammar import Terminal, NonTerminal, Rule, Grammar
 from jizzy.json.builder import JsonBuilder, Value, Object
 from jizzy.operators import Repeat
@@ -20,6 +21,8 @@ class StrictJson(Grammar[JsonBuilder, Object]):
     OB = Terminal(pattern=r"\[")
     CB = Terminal(pattern=r"\]")
 
+    WHITESPACE = Terminal(pattern=r"[ \t\n\r]+", skip=True)
+
     VALUE = NonTerminal()
     PAIR = NonTerminal()
     KEY = NonTerminal()
@@ -134,6 +137,15 @@ class LenientJson(StrictJson):
     ) -> Value:
         return super().parse(text, builder=builder)
 
+    @classmethod
+    def iter_documents(  # type: ignore
+        cls,
+        stream: Source | IO[Any] | Iterable[Source],
+        builder: JsonBuilder | None = None,
+        chunk_size: int = 65536
+    ) -> Iterator[Value]:
+        return super().iter_documents(stream, builder=builder, chunk_size=chunk_size)
+
     @classmethod
     def start(cls) -> NonTerminal:
         return cls.VALUE
@@ -0,0 +1,452 @@
+from __future__ import annotations
+
+import copy
+import regex
+
+from array import array
+from mmap import mmap
+from regex import POSIX, VERSION1
+from typing import Any, Iterable, Iterator, Literal, Sequence, overload
+
+from jizzy.common import ParseError, Source, Terminal, Token
+from jizzy.dfa import Dfa, UnsupportedPattern
+
+LexerKind = Literal["dfa", "regex"]
+
+# Where a match stands when the text runs out, the DFA state reached, -1
+# once it settled, and the accept bits of every terminal matched on the
+# way, 0 for none yet
+Progress = tuple[int, int]
+
+
+def unmatched(text: Source, position: int, offset: int = 0) -> ParseError:
+    # offset is where text starts in the whole input
+    char = text[position:position + 1]
+    if not isinstance(char, str):
+        char = bytes(char)
+    return ParseError(
+        f"Unexpected character: {char!r} at position {offset + position}"
+    )
+
+
+def as_source(text: Source) -> Source:
+    # Memoryviews are scanned as flat unsigned bytes
+    if isinstance(text, memoryview) and text.format != "B":
+        return text.cast("B")
+    return text
+
+
+class TokenBuffer:
+    # Struct-of-arrays token stream, the terminal index, start and stop of
+    # every token live in parallel arrays and a Token is only created when
+    # an element is accessed
+    def __init__(self, source: Source, terminals: Sequence[Terminal]):
+        self.source = source
+        # Indexed by Terminal.idx
+        self.terminals = terminals
+
+        self.types = array("h")
+        self.starts = array("q")
+        self.stops = array("q")
+
+    @classmethod
+    def from_spans(
+        cls,
+        source: Source,
+        terminals: Sequence[Terminal],
+        spans: Iterable[tuple[Terminal, int, int]]
+    ) -> TokenBuffer:
+        buffer = cls(source, terminals)
+        append_type = buffer.types.append
+        append_start = buffer.starts.append
+        append_stop = buffer.stops.append
+        for terminal, start, stop in spans:
+            append_type(terminal.idx)
+            append_start(start)
+            append_stop(stop)
+        return buffer
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            vector.itemsize * len(vector)
+            for vector in (self.types, self.starts, self.stops)
+        )
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    @overload
+    def __getitem__(self, idx: int) -> Token:
+        pass
+
+    @overload
+    def __getitem__(self, idx: slice) -> list[Token]:
+        pass
+
+    def __getitem__(self, idx: int | slice) -> Token | list[Token]:
+        if isinstance(idx, slice):
+            return [self[position] for position in range(*idx.indices(len(self)))]
+
+        start = self.starts[idx]
+        stop = self.stops[idx]
+        return Token(
+            start=start,
+            stop=stop,
+            source=self.source,
+            type=self.terminals[self.types[idx]]
+        )
+
+    def __iter__(self) -> Iterator[Token]:
+        for idx in range(len(self)):
+            yield self[idx]
+
+
+class RegexScanner:
+    # All terminal patterns as one alternation of named groups, the outer
+    # group of whichever alternative matched is the match's lastindex. The
+    # first alternative that matches wins, with longest the longest match
+    # does and ties go to the first, the same as the DFA scanner.
+    def __init__(self, terminals: list[Terminal], longest: bool = False):
+        self.terminals = [
+            terminal
+            for terminal in terminals
+            if terminal.pattern is not None
+        ]
+        self.longest = longest
+        # POSIX matching is leftmost longest
+        self.flags = (VERSION1 | POSIX) if longest else VERSION1
+        self.pattern = regex.compile(
+            "|".join(
+                f"(?P<_{terminal.idx}>{terminal.pattern})"
+                for terminal in self.terminals
+            ),
+            flags=self.flags
+        )
+
+        self.groups: list[Terminal | None] = [None] * (self.pattern.groups + 1)
+        for terminal in self.terminals:
+            self.groups[self.pattern.groupindex[f"_{terminal.idx}"]] = terminal
+
+        # Compiled on first use, bytes patterns have ASCII semantics
+        self.bytes_pattern: regex.Pattern[bytes] | None = None
+
+        self.restricted: dict[frozenset[int], RegexScanner] = {}
+
+    def restrict(self, terminals: Iterable[Terminal]) -> RegexScanner:
+        # Scanner for only some of the terminals, equal subsets share one.
+        # Skipped terminals stay enabled in every subset.
+        key = frozenset(terminal.idx for terminal in terminals)
+        scanner = self.restricted.get(key)
+        if scanner is None:
+            # Threads racing here agree on whichever scanner lands first
+            scanner = self.restricted.setdefault(key, RegexScanner(
+                [
+                    terminal
+                    for terminal in self.terminals
+                    if terminal.idx in key or terminal.skip
+                ],
+                self.longest
+            ))
+        return scanner
+
+    def pattern_for(self, text: Source) -> regex.Pattern[Any]:
+        if isinstance(text, str):
+            return self.pattern
+
+        if self.bytes_pattern is None:
+            self.bytes_pattern = regex.compile(
+                self.pattern.pattern.encode(),
+                flags=self.flags
+            )
+        return self.bytes_pattern
+
+    def munch(
+        self,
+        text: Source,
+        start: int,
+        partial: bool = False
+    ) -> tuple[Terminal | None, int, bool]:
+        # Terminal and end of the match at start, None if nothing matches.
+        # With partial, the last value tells whether text ending where it
+        # does could change the match, if text[start:] is a prefix of some
+        # longer match.
+        if not self.terminals:
+            return None, start, False
+
+        pattern = self.pattern_for(text)
+        extendable = partial and pattern.fullmatch(text, start, partial=True) is not None
+
+        match = pattern.match(text, start)
+        # Empty matches would never advance the scanner
+        if match is None or match.end() == start:
+            return None, start, extendable
+
+        return self.groups[match.lastindex], match.end(), extendable
+
+    def spans(self, text: Source) -> Iterator[tuple[Terminal, int, int]]:
+        # Terminal, start and stop of every token, skipped terminals
+        # excluded
+        text = as_source(text)
+        groups = self.groups
+        position = 0
+        for match in self.pattern_for(text).finditer(text):
+            start = match.start()
+            if start != position:
+                raise unmatched(text, position)
+
+            position = match.end()
+            terminal = groups[match.lastindex]
+            if not terminal.skip:
+                yield terminal, start, position
+
+        if position != len(text):
+            raise unmatched(text, position)
+
+    def scan(self, text: Source) -> Iterator[Token]:
+        text = as_source(text)
+        for terminal, start, stop in self.spans(text):
+            yield Token(
+                start=start,
+                stop=stop,
+                source=text,
+                type=terminal
+            )
+
+
+class DfaScanner:
+    # All terminal patterns compiled into a single minimized DFA, scanning
+    # takes the longest match at every position and breaks ties by the
+    # order the terminals are declared in
+    def __init__(self, terminals: list[Terminal]):
+        self.terminals = [
+            terminal
+            for terminal in terminals
+            if terminal.pattern is not None
+        ]
+        self.dfa = Dfa.from_patterns([
+            terminal.pattern
+            for terminal in self.terminals
+        ])
+
+        # Plain lists index faster than numpy arrays from Python code
+        self.transitions: list[list[int]] = self.dfa.transitions.tolist()
+        self.accepts: list[Terminal | None] = [
+            self.terminals[accept] if accept >= 0 else None
+            for accept in self.dfa.accepts.tolist()
+        ]
+        self.ascii_classes: list[int] = self.dfa.ascii_classes.tolist()
+        self.byte_classes: list[int] = self.dfa.byte_classes.tolist()
+
+        # Terminals enabled for munch(), restrict() shares the DFA and
+        # only narrows the mask
+        self.mask = (1 << len(self.terminals)) - 1
+        self.restricted: dict[frozenset[int], DfaScanner] = {}
+
+    def restrict(self, terminals: Iterable[Terminal]) -> DfaScanner:
+        key = frozenset(terminal.idx for terminal in terminals)
+        scanner = self.restricted.get(key)
+        if scanner is None:
+            scanner = copy.copy(self)
+            scanner.mask = sum(
+                1 << position
+                for position, terminal in enumerate(self.terminals)
+                if terminal.idx in key or terminal.skip
+            )
+            scanner = self.restricted.setdefault(key, scanner)
+        return scanner
+
+    def munch(
+        self,
+        text: Source,
+        start: int,
+        partial: bool = False
+    ) -> tuple[Terminal | None, int, bool]:
+        if not isinstance(text, str):
+            accepted, stop, extendable = self.byte_munch(text, start)
+        else:
+            accepted, stop, extendable = self.text_munch(text, start)
+
+        if not accepted:
+            return None, start, partial and extendable
+        return self.terminals[(accepted & -accepted).bit_length() - 1], stop, partial and extendable
+
+    def byte_munch(
+        self,
+        data: bytes | bytearray | memoryview | mmap,
+        start: int
+    ) -> tuple[int, int, bool]:
+        # Accept bits and end of the longest match at start, and whether
+        # data ran out before the DFA settled on it
+        transitions = self.transitions
+        accept_sets = self.dfa.accept_sets
+        live_sets = self.dfa.live_sets
+        byte_classes = self.byte_classes
+        mask = self.mask
+
+        state = 0
+        accepted = 0
+        stop = start
+        for position in range(start, len(data)):
+            state = transitions[state][byte_classes[data[position]]]
+            if state < 0 or not live_sets[state] & mask:
+                return accepted, stop, False
+
+            if accept_sets[state] & mask:
+                accepted = accept_sets[state] & mask
+                stop = position + 1
+        return accepted, stop, True
+
+    def text_munch(self, text: str, start: int) -> tuple[int, int, bool]:
+        transitions = self.transitions
+        accept_sets = self.dfa.accept_sets
+        live_sets = self.dfa.live_sets
+        ascii_classes = self.ascii_classes
+        char_class = self.dfa.char_class
+        mask = self.mask
+
+        state = 0
+        accepted = 0
+        stop = start
+        for position in range(start, len(text)):
+            code = ord(text[position])
+            state = transitions[state][
+                ascii_classes[code] if code < 128 else char_class(text[position])
+            ]
+            if state < 0 or not live_sets[state] & mask:
+                return accepted, stop, False
+
+            if accept_sets[state] & mask:
+                accepted = accept_sets[state] & mask
+                stop = position + 1
+        return accepted, stop, True
+
+    def extend(self, text: Source, progress: Progress) -> Progress:
+        # Runs a match munch() ran out of text for on over text, which
+        # carries on where that text ended
+        transitions = self.transitions
+        accept_sets = self.dfa.accept_sets
+        live_sets = self.dfa.live_sets
+        ascii_classes = self.ascii_classes
+        char_class = self.dfa.char_class
+        mask = self.mask
+
+        state, accepted = progress
+        if state < 0:
+            return progress
+
+        classes: Iterable[int]
+        if isinstance(text, str):
+            classes = (
+                ascii_classes[code] if (code := ord(char)) < 128 else char_class(char)
+                for char in text
+            )
+        else:
+            # Iterating a memoryview gives ints for mmaps too
+            classes = map(self.byte_classes.__getitem__, memoryview(text))
+
+        for class_idx in classes:
+            state = transitions[state][class_idx]
+            if state < 0 or not live_sets[state] & mask:
+                return -1, accepted
+            accepted |= accept_sets[state] & mask
+
+        return state, accepted
+
+    def spans(self, text: Source) -> Iterator[tuple[Terminal, int, int]]:
+        text = as_source(text)
+        if not isinstance(text, str):
+            return self.byte_spans(text)
+        return self.text_spans(text)
+
+    def byte_spans(
+        self,
+        data: bytes | bytearray | memoryview | mmap
+    ) -> Iterator[tuple[Terminal, int, int]]:
+        transitions = self.transitions
+        accepts = self.accepts
+        byte_classes = self.byte_classes
+
+        start = 0
+        length = len(data)
+        while start < length:
+            state = 0
+            accepted: Terminal | None = None
+            stop = start
+            for position in range(start, length):
+                state = transitions[state][byte_classes[data[position]]]
+                if state < 0:
+                    break
+
+                if accepts[state] is not None:
+                    accepted = accepts[state]
+                    stop = position + 1
+
+            if accepted is None:
+                raise unmatched(data, start)
+
+            if not accepted.skip:
+                yield accepted, start, stop
+            start = stop
+
+    def text_spans(self, text: str) -> Iterator[tuple[Terminal, int, int]]:
+        transitions = self.transitions
+        accepts = self.accepts
+        ascii_classes = self.ascii_classes
+        char_class = self.dfa.char_class
+
+        start = 0
+        length = len(text)
+        while start < length:
+            state = 0
+            accepted: Terminal | None = None
+            stop = start
+            for position in range(start, length):
+                code = ord(text[position])
+                state = transitions[state][
+                    ascii_classes[code] if code < 128 else char_class(text[position])
+                ]
+                if state < 0:
+                    break
+
+                if accepts[state] is not None:
+                    accepted = accepts[state]
+                    stop = position + 1
+
+            if accepted is None:
+                raise unmatched(text, start)
+
+            if not accepted.skip:
+                yield accepted, start, stop
+            start = stop
+
+    def scan(self, text: Source) -> Iterator[Token]:
+        text = as_source(text)
+        for terminal, start, stop in self.spans(text):
+            yield Token(
+                start=start,
+                stop=stop,
+                source=text,
+                type=terminal
+            )
+
+
+type Scanner = RegexScanner | DfaScanner
+
+
+def make_scanner(
+    terminals: list[Terminal],
+    kind: LexerKind = "dfa"
+) -> Scanner:
+    match kind:
+        case "dfa":
+            try:
+                return DfaScanner(terminals)
+            except UnsupportedPattern:
+                # Patterns beyond regular languages need the regex engine,
+                # which still takes the longest match like the DFA would
+                return RegexScanner(terminals, longest=True)
+        case "regex":
+            return RegexScanner(terminals)
+        case _:
+            raise ValueError(f"Unknown lexer: {kind!r}")
@@ -0,0 +1,468 @@
+from __future__ import annotations
+
+from itertools import chain, islice
+from mmap import mmap
+from typing import Any, AsyncIterable, IO, Iterable, Iterator, TYPE_CHECKING, cast
+
+from jizzy.builder import Builder
+from jizzy.common import Node, ParseError, Source, Terminal, Token
+from jizzy.lexer import DfaScanner, Progress, TokenBuffer, as_source, unmatched
+
+if TYPE_CHECKING:
+    import asyncio
+
+    from jizzy.grammar import GrammarMeta
+
+
+def unexpected_token(token: Token, expected: tuple[Terminal, ...]) -> ParseError:
+    expectation = ", ".join(terminal.name for terminal in expected)
+    return ParseError(
+        f"Unexpected token: {token.text!r} ({token.type.name}), "
+        f"expected one of: {expectation}"
+    )
+
+
+class Parser[T: Builder, U: Node]:
+    # LALR parser that keeps its stacks between calls. parse() hands it all
+    # tokens at once, feed() and finish() push text in chunks. Text at the
+    # end of a chunk that the next chunk could still extend into a longer
+    # token is carried over until then.
+    #
+    # With documents set the input may hold any number of documents back
+    # to back. consume() returns each one once the token after it is seen,
+    # and parsing starts over from that token on the next call.
+    def __init__(
+        self,
+        grammar: GrammarMeta[T, U],
+        builder: T | None = None,
+        documents: bool = False
+    ):
+        if builder is None:
+            builder = grammar.builder()()
+
+        self.grammar = grammar
+        self.builder = builder
+        self.tables = grammar.tables()
+
+        # Parallel stacks, states[i] is the state reached after shifting
+        # values[i]
+        self.states: list[int] = [0]
+        self.values: list[Node | int] = [Node(start=0, stop=0)]
+        self.result: U | None = None
+        self.documents: list[U] | None = [] if documents else None
+        self.finished = False
+        self.lookahead: Token | int | None = None
+        # Buffer the token source from indices() reads, if any
+        self.buffer: TokenBuffer | None = None
+
+        # Input not scanned yet, in the pieces it came in, and the offset
+        # of its first character. Pieces kept past a call are copies, the
+        # caller may reuse the buffer of a bytes-like chunk. progress holds where the carried token
+        # stands for the scanner and its fallback once worked out.
+        self.pending: list[Source] = []
+        self.progress: tuple[Progress, Progress] | None = None
+        self.offset = 0
+        # New text the regex scanner lets the carried text wait for
+        self.rescan_after = 0
+        # Whether the chunks fed so far were bytes-like, None before any
+        self.binary: bool | None = None
+
+    def consume(self, tokens: Iterable[Token | int]) -> U | None:
+        # Runs the automaton over tokens, returns the result once the
+        # end of input token is accepted, or once any document is when
+        # parsing documents. Tokens from indices() may be buffer indices.
+        builder = self.builder
+        tables = self.tables
+        rows = tables.rows
+        reductions = tables.reductions
+        states = self.states
+        # Nodes, and Tokens or buffer indices for the terminals shifted,
+        # materialize() makes Tokens of the indices a reduction reads
+        values: list[Any] = self.values
+        documents = self.documents
+        buffer = self.buffer
+
+        if self.lookahead is not None:
+            tokens = chain((self.lookahead,), tokens)
+            self.lookahead = None
+
+        for token in tokens:
+            if buffer is None or type(token) is not int:
+                symbol = cast(Token, token).type.idx
+            else:
+                symbol = buffer.types[token]
+
+            while True:
+                action: int = rows[states[-1]][symbol]
+                if action > 0:
+                    states.append(action - 1)
+                    values.append(token)
+                    break
+
+                if action == 0:
+                    if documents is None:
+                        raise unexpected_token(self.token(token), tables.expected[states[-1]])
+
+                    if symbol == 0 and len(states) == 1:
+                        # Nothing after the last document
+                        self.finished = True
+                        return None
+
+                    if not self.at_document_end():
+                        raise unexpected_token(self.token(token), tables.expected[states[-1]])
+
+                    # Finish the document as if the input ended before token
+                    symbol = 0
+                    continue
+
+                if action == -1:
+                    document: U = values[-1]
+                    if documents is None:
+                        assert symbol == 0
+                        self.result = document
+                        self.finished = True
+                        return document
+
+                    documents.append(document)
+                    del states[1:]
+                    del values[1:]
+                    values[0] = Node(start=document.stop, stop=document.stop)
+
+                    if self.token(token).type.idx == 0:
+                        self.finished = True
+                    else:
+                        self.lookahead = token
+                    return document
+
+                callback, lhs, size, offsets = reductions[-action - 1]
+                if buffer is not None:
+                    token = self.materialize(size, offsets, token)
+
+                if size:
+                    start = values[-size].start
+                    stop = values[-1].stop
+                else:
+                    start = values[-1].stop
+                    stop = cast(Token, token).start
+
+                match len(offsets):
+                    case 0:
+                        result = callback(builder, start, stop)
+                    case 1:
+                        result = callback(builder, start, stop, values[offsets[0]])
+                    case 2:
+                        result = callback(builder, start, stop, values[offsets[0]], values[offsets[1]])
+                    case _:
+                        result = callback(builder, start, stop, *[values[offset] for offset in offsets])
+
+                if size == 1:
+                    values[-1] = result
+                    states[-1] = rows[states[-2]][lhs] - 1
+                else:
+                    if size:
+                        del values[-size:]
+                        del states[-size:]
+                    values.append(result)
+                    states.append(rows[states[-1]][lhs] - 1)
+
+        return None
+
+    def indices(self, buffer: TokenBuffer) -> Iterator[Token | int]:
+        # Token source over a TokenBuffer. Terminals are shifted as their
+        # buffer indices and only become Tokens where a reduction reads
+        # them or an error reports them, the end of input is a Token.
+        self.buffer = buffer
+        return chain(range(len(buffer)), (self.end_token(len(buffer.source)),))
+
+    def token(self, token: Token | int) -> Token:
+        if type(token) is int:
+            return self.buffer[token]
+        return cast(Token, token)
+
+    def materialize(
+        self,
+        size: int,
+        offsets: tuple[int, ...],
+        token: Token | int
+    ) -> Token | int:
+        # Turns the buffer indices a reduction reads into Tokens in place,
+        # its first and last values for the span and any it passes on. An
+        # empty reduction ends where the lookahead starts, which comes back
+        # as a Token then.
+        values = self.values
+        for offset in (-size if size else -1, -1, *offsets):
+            value = values[offset]
+            if type(value) is int:
+                values[offset] = self.token(value)
+
+        if size:
+            return token
+        return self.token(token)
+
+    def at_document_end(self) -> bool:
+        # Whether the end of input would be accepted in the current state,
+        # follows the reductions on a copy of the state stack only
+        rows = self.tables.rows
+        reductions = self.tables.reductions
+        states = self.states[:]
+        while True:
+            action: int = rows[states[-1]][0]
+            if action == -1:
+                return True
+            if action >= 0:
+                return False
+
+            _, lhs, size, _ = reductions[-action - 1]
+            if size:
+                del states[-size:]
+            states.append(rows[states[-1]][lhs] - 1)
+
+    def take(self) -> list[U]:
+        # Documents completed so far and not yet taken
+        documents = self.documents
+        if not documents:
+            return []
+        self.documents = []
+        return documents
+
+    def tokens(self, text: Source) -> Iterator[Token]:
+        # All of text at once, through the scanners that never need to
+        # wait for more input
+        grammar = self.grammar
+        if grammar.contextual_lexing():
+            tokens = grammar.iter_contextual_tokens(text, self.states)
+        else:
+            tokens = grammar.iter_tokens(text)
+        return chain(tokens, (self.end_token(len(text)),))
+
+    def end_token(self, position: int) -> Token:
+        return Token(
+            start=position,
+            stop=position,
+            text="$",
+            type=self.grammar.terminals()[0]
+        )
+
+    def join(self, chunk: Source) -> Source:
+        # Text for scan() to go on with. While chunk only extends the token
+        # carried over it is carried too and nothing is left to scan, once
+        # the token settles the pieces are joined and scanned once more.
+        if self.finished:
+            raise ParseError("Cannot feed a finished parser")
+
+        chunk = as_source(chunk)
+        binary = not isinstance(chunk, str)
+        if self.binary is None:
+            self.binary = binary
+        elif binary != self.binary:
+            raise TypeError(
+                f"Cannot feed a {'bytes-like' if binary else 'str'} chunk to a parser "
+                f"fed {'bytes-like' if self.binary else 'str'} chunks before"
+            )
+
+        if not self.pending:
+            return chunk
+        if self.unsettled(chunk):
+            self.pending.append(chunk if isinstance(chunk, (str, bytes)) else bytes(chunk))
+            return chunk[:0]
+
+        self.pending.append(chunk)
+        return self.carried()
+
+    def carried(self) -> Source:
+        # The pending pieces as one text, taken out of the parser
+        pending = self.pending
+        self.pending = []
+        self.progress = None
+        if len(pending) == 1:
+            return pending[0]
+        if self.binary:
+            return b"".join(cast(list[bytes], pending))
+        return "".join(cast(list[str], pending))
+
+    def unsettled(self, chunk: Source) -> bool:
+        # Whether the token carried over could still grow past chunk. The
+        # DFA runs on over chunk alone from where it stopped, so a long
+        # token fed in many chunks is read once rather than once per chunk.
+        grammar = self.grammar
+        scanner = grammar.scanner()
+        if not isinstance(scanner, DfaScanner):
+            # The regex scanner cannot pick up a match and scan() reads the
+            # carried text again, only once as much text came in as it held
+            # then, which keeps rereading it linear in the input overall
+            self.rescan_after -= len(chunk)
+            return self.rescan_after > 0
+
+        current = scanner
+        if grammar.contextual_lexing():
+            current = cast(DfaScanner, grammar.contextual_scanners()[self.states[-1]])
+
+        if self.progress is None:
+            self.progress = (0, 0), (0, 0)
+            for piece in self.pending:
+                self.advance(current, scanner, piece)
+        return self.advance(current, scanner, chunk)
+
+    def advance(self, current: DfaScanner, scanner: DfaScanner, text: Source) -> bool:
+        # Same decision as scan() makes at the end of its text: once the
+        # scanner for the state matched anything the token is unsettled
+        # while it can match more, until then while the full scanner it
+        # falls back to can
+        ours, fallback = self.progress
+        ours = current.extend(text, ours)
+        if ours[1] or current is scanner:
+            unsettled = ours[0] >= 0
+        else:
+            fallback = scanner.extend(text, fallback)
+            unsettled = fallback[0] >= 0
+
+        self.progress = ours, fallback
+        return unsettled
+
+    def feed(self, chunk: Source) -> None:
+        self.run(self.scan(self.join(chunk), final=False))
+
+    def finish(self) -> U:
+        if not self.finished:
+            self.run(self.tail())
+        return self.result
+
+    def run(self, tokens: Iterator[Token]) -> None:
+        # consume() stops after each document, carries on to the end
+        while self.consume(tokens) is not None:
+            pass
+
+    def feed_steps(self, chunk: Source, size: int) -> Iterator[None]:
+        # feed() that stops after every size tokens, for callers that
+        # need to get a word in while a large chunk is parsed
+        return self.steps(self.scan(self.join(chunk), final=False), size)
+
+    def finish_steps(self, size: int) -> Iterator[None]:
+        if not self.finished:
+            yield from self.steps(self.tail(), size)
+
+    def steps(self, tokens: Iterator[Token], size: int) -> Iterator[None]:
+        # Tokens are pulled one at a time as they are parsed, not a batch
+        # ahead, contextual scanners pick each token's scanner by the state
+        # the tokens before it left on the stack
+        taken = 0
+
+        def counted() -> Iterator[Token]:
+            nonlocal taken
+            for token in tokens:
+                taken += 1
+                yield token
+
+        counted_tokens = counted()
+        while True:
+            before = taken
+            self.run(islice(counted_tokens, size))
+            if taken - before < size:
+                return
+            yield
+
+    def tail(self) -> Iterator[Token]:
+        yield from self.scan(self.carried(), final=True)
+        # After scan() has moved offset to the end of input
+        yield self.end_token(self.offset)
+
+    def scan(self, text: Source, final: bool) -> Iterator[Token]:
+        grammar = self.grammar
+        scanner = grammar.scanner()
+        scanners = grammar.contextual_scanners() if grammar.contextual_lexing() else None
+
+        position = 0
+        try:
+            while position < len(text):
+                current = scanner if scanners is None else scanners[self.states[-1]]
+                terminal, stop, extendable = current.munch(text, position, partial=not final)
+                if terminal is None and current is not scanner:
+                    terminal, stop, extendable = scanner.munch(text, position, partial=not final)
+
+                if extendable:
+                    # The next chunk may still change what matches here
+                    break
+
+                if terminal is None:
+                    raise unmatched(text, position, self.offset)
+
+                if not terminal.skip:
+                    piece = text[position:stop]
+                    yield Token(
+                        start=self.offset + position,
+                        stop=self.offset + stop,
+                        text=piece if isinstance(piece, str) else str(piece, "utf-8"),
+                        type=terminal
+                    )
+                position = stop
+        finally:
+            rest = text[position:]
+            if len(rest):
+                self.rescan_after = len(rest)
+                self.pending.append(rest if isinstance(rest, str) else bytes(rest))
+            self.offset += position
+
+
+def iter_chunks(stream: IO[Any] | Iterable[Source], size: int) -> Iterator[Source]:
+    if hasattr(stream, "read"):
+        while chunk := cast(IO[Any], stream).read(size):
+            yield chunk
+    else:
+        yield from cast(Iterable[Source], stream)
+
+
+async def read_chunks(
+    stream: asyncio.StreamReader | AsyncIterable[Source],
+    size: int
+) -> AsyncIterable[Source]:
+    # Imported here, asyncio alone takes longer to import than jizzy
+    import asyncio
+
+    if isinstance(stream, asyncio.StreamReader):
+        while data := await stream.read(size):
+            yield data
+    else:
+        async for chunk in stream:
+            yield chunk
+
+
+async def parse_async[T: Builder, U: Node](
+    parser: Parser[T, U],
+    stream: asyncio.StreamReader | AsyncIterable[Source],
+    tokens_per_step: int,
+    chunk_size: int
+) -> U:
+    # Hands control back to the event loop after every tokens_per_step
+    # tokens and whenever the stream has nothing to read
+    import asyncio
+
+    async for chunk in read_chunks(stream, chunk_size):
+        for _ in parser.feed_steps(chunk, tokens_per_step):
+            await asyncio.sleep(0)
+
+    for _ in parser.finish_steps(tokens_per_step):
+        await asyncio.sleep(0)
+    return parser.result
+
+
+def iter_documents[T: Builder, U: Node](
+    parser: Parser[T, U],
+    stream: Source | IO[Any] | Iterable[Source],
+    chunk_size: int
+) -> Iterator[U]:
+    # Documents are taken as consume() completes them rather than once
+    # per chunk, a single large chunk does not pile them all up
+    if isinstance(stream, (str, bytes, bytearray, memoryview, mmap)):
+        tokens = parser.tokens(as_source(stream))
+        while parser.consume(tokens) is not None:
+            yield from parser.take()
+        return
+
+    for chunk in iter_chunks(stream, chunk_size):
+        tokens = parser.scan(parser.join(chunk), final=False)
+        while parser.consume(tokens) is not None:
+            yield from parser.take()
+
+    tokens = parser.tail()
+    while parser.consume(tokens) is not None:
+        yield from parser.take()
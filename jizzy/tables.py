@@ -0,0 +1,364 @@
+from __future__ import annotations
+
+import mmap
+import numpy as np
+
+from array import array
+from dataclasses import dataclass
+from collections import Counter
+from typing import Callable, Iterable, Literal, Sequence
+from numpy.typing import NDArray
+
+from jizzy.common import Node, Rule, Terminal
+
+TableLayout = Literal["dense", "compressed", "shared"]
+
+
+def typecode(values: Sequence[int]) -> str:
+    if all(-0x8000 <= value < 0x8000 for value in values):
+        return "h"
+    return "i"
+
+
+def most_common(values: Iterable[int]) -> int:
+    counts = Counter(values)
+    if not counts:
+        return 0
+    value, _ = counts.most_common(1)[0]
+    return value
+
+
+def displace(
+    vectors: list[dict[int, int]],
+    width: int
+) -> tuple[list[int], list[int], list[int], list[int]]:
+    # Overlays sparse vectors into a single next/check pair, each vector
+    # is placed at the first offset where none of its entries collide.
+    # Identical vectors share one placement and one check key.
+    keys: list[int] = []
+    bases: list[int] = []
+    next: list[int] = []
+    check: list[int] = []
+
+    placed: dict[tuple[tuple[int, int], ...], tuple[int, int]] = {}
+    order = sorted(
+        range(len(vectors)),
+        key=lambda idx: len(vectors[idx]),
+        reverse=True
+    )
+    placements: dict[int, tuple[int, int]] = {}
+
+    lowest_free = 0
+    for idx in order:
+        entries = tuple(sorted(vectors[idx].items()))
+        if entries in placed:
+            placements[idx] = placed[entries]
+            continue
+
+        key = len(placed)
+        base = 0
+        if entries:
+            base = max(lowest_free - entries[0][0], 0)
+            while True:
+                if base + width > len(check):
+                    grow = base + width - len(check)
+                    next.extend([0] * grow)
+                    check.extend([-1] * grow)
+
+                if all(check[base + position] == -1 for position, _ in entries):
+                    break
+                base += 1
+
+            for position, value in entries:
+                next[base + position] = value
+                check[base + position] = key
+
+            while lowest_free < len(check) and check[lowest_free] != -1:
+                lowest_free += 1
+
+        placed[entries] = placements[idx] = key, base
+
+    if len(check) < width:
+        next.extend([0] * (width - len(check)))
+        check.extend([-1] * (width - len(check)))
+
+    for idx in range(len(vectors)):
+        key, base = placements[idx]
+        keys.append(key)
+        bases.append(base)
+
+    return keys, bases, next, check
+
+
+class CompressedRow:
+    __slots__ = ("table", "state", "key", "base", "default")
+
+    def __init__(
+        self,
+        table: CompressedTable,
+        state: int
+    ):
+        self.table = table
+        self.state = state
+        self.key = table.action_key[state]
+        self.base = table.action_base[state]
+        self.default = table.action_default[state]
+
+    def __getitem__(self, symbol: int) -> int:
+        table = self.table
+
+        column = symbol - table.terminal_count
+        if column < 0:
+            idx = self.base + symbol
+            if table.action_check[idx] == self.key:
+                return table.action_next[idx]
+            return self.default
+
+        idx = table.goto_base[column] + self.state
+        if table.goto_check[idx] == table.goto_key[column]:
+            return table.goto_next[idx]
+        return table.goto_default[column]
+
+
+class CompressedTable:
+    # Row displacement ("comb") packing of the automaton, the layout used
+    # by yacc and bison. The action part keeps one default reduction per
+    # state, the most common one, and the goto part one default target per
+    # nonterminal. Whatever differs from the defaults is overlaid into
+    # next/check vector pairs, rows for actions and columns for gotos.
+    terminal_count: int
+
+    action_key: array[int]
+    action_base: array[int]
+    action_default: array[int]
+    action_next: array[int]
+    action_check: array[int]
+
+    goto_key: array[int]
+    goto_base: array[int]
+    goto_default: array[int]
+    goto_next: array[int]
+    goto_check: array[int]
+
+    def __init__(
+        self,
+        automaton: NDArray[np.integer],
+        terminal_count: int
+    ):
+        state_count, symbol_count = automaton.shape
+        dense = automaton.tolist()
+
+        self.terminal_count = terminal_count
+
+        # The accept action is never a default, the parser has to see EOF
+        # before it stops
+        action_defaults = [
+            most_common(
+                action
+                for action in row[:terminal_count]
+                if action < -1
+            )
+            for row in dense
+        ]
+        action_vectors = [
+            {
+                symbol: action
+                for symbol, action in enumerate(row[:terminal_count])
+                if action != 0 and action != default
+            }
+            for row, default in zip(dense, action_defaults)
+        ]
+
+        goto_defaults = [
+            most_common(
+                row[symbol]
+                for row in dense
+                if row[symbol] != 0
+            )
+            for symbol in range(terminal_count, symbol_count)
+        ]
+        goto_vectors = [
+            {
+                state: row[symbol]
+                for state, row in enumerate(dense)
+                if row[symbol] != 0 and row[symbol] != default
+            }
+            for symbol, default in zip(
+                range(terminal_count, symbol_count),
+                goto_defaults
+            )
+        ]
+
+        keys, bases, next, check = displace(action_vectors, terminal_count)
+        self.action_key = array(typecode(keys), keys)
+        self.action_base = array(typecode(bases), bases)
+        self.action_default = array(typecode(action_defaults), action_defaults)
+        self.action_next = array(typecode(next), next)
+        self.action_check = array(typecode(check), check)
+
+        keys, bases, next, check = displace(goto_vectors, state_count)
+        self.goto_key = array(typecode(keys), keys)
+        self.goto_base = array(typecode(bases), bases)
+        self.goto_default = array(typecode(goto_defaults), goto_defaults)
+        self.goto_next = array(typecode(next), next)
+        self.goto_check = array(typecode(check), check)
+
+        self.rows = [
+            CompressedRow(self, state)
+            for state in range(state_count)
+        ]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            vector.itemsize * len(vector)
+            for vector in (
+                self.action_key,
+                self.action_base,
+                self.action_default,
+                self.action_next,
+                self.action_check,
+                self.goto_key,
+                self.goto_base,
+                self.goto_default,
+                self.goto_next,
+                self.goto_check
+            )
+        )
+
+    def __getitem__(self, state: int) -> CompressedRow:
+        return self.rows[state]
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+
+class SharedTable:
+    # The dense automaton as C ints in a single memory mapping, rows holds
+    # a memoryview into it per state. The mapped pages hold no Python
+    # objects, so reading them never touches a reference count. Processes
+    # mapping the same file, and children forked after the table is built,
+    # all share one copy instead of each dirtying its own.
+    buffer: mmap.mmap
+    automaton: NDArray[np.intc]
+    rows: list[memoryview]
+
+    def __init__(
+        self,
+        automaton: NDArray[np.integer],
+        buffer: mmap.mmap | None = None
+    ):
+        state_count, symbol_count = automaton.shape
+        if buffer is None:
+            # Anonymous mappings are shared with forked children
+            buffer = mmap.mmap(-1, automaton.size * np.dtype(np.intc).itemsize)
+            np.frombuffer(buffer, dtype=np.intc)[:] = automaton.ravel()
+
+        self.buffer = buffer
+        self.automaton = np.frombuffer(buffer, dtype=np.intc).reshape(automaton.shape)
+        self.automaton.flags.writeable = False
+
+        flat = memoryview(buffer).toreadonly().cast("i")
+        self.rows = [
+            flat[state * symbol_count:(state + 1) * symbol_count]
+            for state in range(state_count)
+        ]
+
+    @property
+    def nbytes(self) -> int:
+        return self.automaton.nbytes
+
+
+# What the parse loop needs to know about a rule to reduce it: callback,
+# lhs symbol index, rhs length and the stack offsets of its parameters
+Reduction = tuple[Callable[..., Node], int, int, tuple[int, ...]]
+
+
+@dataclass(kw_only=True, frozen=True)
+class ParseTables:
+    # What the parser indexes as rows[state][symbol], either the dense
+    # automaton as nested tuples of ints or a list of views into its
+    # shared mapping, or its compressed form. Each layout keeps only that
+    # one form of the automaton.
+    rows: Sequence[Sequence[int]] | CompressedTable
+    expected: tuple[tuple[Terminal, ...], ...]
+    reductions: tuple[Reduction, ...]
+    # Owns the mapping the rows of the shared layout view
+    shared: SharedTable | None = None
+
+    @property
+    def automaton(self) -> NDArray[np.integer] | None:
+        # The dense automaton, read only. The shared layout's is a view of
+        # its mapping, the dense layout's a copy of its rows made on every
+        # call. The compressed layout cannot give it back, its errors read
+        # as default reductions, GrammarMeta.automaton() gets it instead.
+        if self.shared is not None:
+            return self.shared.automaton
+        if isinstance(self.rows, CompressedTable):
+            return None
+
+        automaton = np.array(self.rows, dtype=np.intc)
+        automaton.flags.writeable = False
+        return automaton
+
+    @classmethod
+    def from_automaton(
+        cls,
+        automaton: NDArray[np.integer],
+        terminals: list[Terminal],
+        rules: list[Rule],
+        layout: TableLayout = "dense",
+        buffer: mmap.mmap | None = None
+    ) -> ParseTables:
+        # buffer backs a shared layout, fresh memory is mapped without it
+
+        # States with the same expected terminals share one tuple
+        interned: dict[tuple[Terminal, ...], tuple[Terminal, ...]] = {}
+        expected = tuple(
+            interned.setdefault(terminals_expected, terminals_expected)
+            for terminals_expected in (
+                tuple(
+                    terminal
+                    for terminal in terminals
+                    if row[terminal.idx] != 0
+                )
+                for row in automaton.tolist()
+            )
+        )
+
+        shared = None
+        rows: Sequence[Sequence[int]] | CompressedTable
+        match layout:
+            case "dense":
+                # Equal actions share one int object, most of them are
+                # outside the small ints Python caches
+                actions: dict[int, int] = {}
+                rows = tuple(
+                    tuple(actions.setdefault(action, action) for action in row)
+                    for row in automaton.tolist()
+                )
+            case "compressed":
+                rows = CompressedTable(automaton, len(terminals))
+            case "shared":
+                # A plain list, indexing it is as fast as the dense rows
+                shared = SharedTable(automaton, buffer)
+                rows = shared.rows
+            case _:
+                raise ValueError(f"Unknown table layout: {layout!r}")
+
+        reductions = tuple(
+            (
+                rule.callback,
+                rule.lhs.idx,
+                len(rule.rhs),
+                tuple(idx - len(rule.rhs) for idx in rule.parameter_indices)
+            )
+            for rule in rules
+        )
+
+        return cls(
+            rows=rows,
+            expected=expected,
+            reductions=reductions,
+            shared=shared
+        )
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import pytest
+import importlib.util
+
+from pathlib import Path
+from types import ModuleType
+
+from jizzy.builder import Builder
+from jizzy.generate import main
+from jizzy.common import ParseError
+from jizzy.grammar import Grammar, GrammarMeta, Rule, Terminal, NonTerminal, Node
+from jizzy.jizz.parser import Jizz
+from jizzy.json.parser import StrictJson, LenientJson
+from jizzy.lexer import LexerKind
+
+
+def load_module(path: Path) -> ModuleType:
+    spec = importlib.util.spec_from_file_location(path.stem, path)
+    assert spec is not None and spec.loader is not None
+
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def generate(grammar: GrammarMeta, path: Path) -> ModuleType:
+    grammar.generate_module(path)
+    source = path.read_text()
+    assert "jizzy.grammar" not in source
+    return load_module(path)
+
+
+def test_generate_json(tmp_path: Path):
+    strict = generate(StrictJson, tmp_path / "strict_json.py")
+    lenient = generate(LenientJson, tmp_path / "lenient_json.py")
+    assert "import regex" not in (tmp_path / "strict_json.py").read_text()
+
+    for text in ["{}", "{\"a\": [1, 2.5e+3, true, null, {\"b\": \"c\"}]}"]:
+        assert strict.parse(text) == StrictJson.parse(text)
+        assert strict.tokenize(text) == StrictJson.tokenize(text)
+
+    for text in ["[]", "null", "[1, {0: 0}, \"x\"]"]:
+        assert lenient.parse(text) == LenientJson.parse(text)
+
+    with pytest.raises(ParseError) as generated_error:
+        strict.parse("{\"a\" 1}")
+    with pytest.raises(ParseError) as expected_error:
+        StrictJson.parse("{\"a\" 1}")
+    assert str(generated_error.value) == str(expected_error.value)
+
+    with pytest.raises(ParseError, match="Unexpected character: '@' at position 6"):
+        strict.parse("{\"a\": @}")
+
+
+def test_generate_regex_scanner(tmp_path: Path):
+    class RegexJson(StrictJson):
+        @classmethod
+        def lexer(cls) -> LexerKind:
+            return "regex"
+
+    generated = generate(RegexJson, tmp_path / "regex_json.py")
+    assert "import regex" in (tmp_path / "regex_json.py").read_text()
+
+    text = "{\"a\": [1, 2.5e+3, true, null, {\"b\": \"c\"}]}"
+    assert generated.parse(text) == RegexJson.parse(text)
+    assert generated.tokenize(text) == RegexJson.tokenize(text)
+
+
+def test_generate_jizz(tmp_path: Path):
+    jizz = generate(Jizz, tmp_path / "jizz.py")
+
+    text = "a = b + c; f(x)[1]{y} while (x) { x -= 1; }"
+    assert jizz.parse(text) == Jizz.parse(text)
+
+    text = "x <<= ++y <=> z if iffy é٣ cafe\u0301 snake‿case"
+    assert jizz.tokenize(text) == Jizz.tokenize(text)
+
+
+def test_generate_cli(tmp_path: Path):
+    path = tmp_path / "cli_json.py"
+    assert main(["jizzy.json.parser:StrictJson", str(path)]) == 0
+    assert load_module(path).parse("{}").to_python() == {}
+
+
+def test_generate_local_callback(tmp_path: Path):
+    class LocalBuilder(Builder):
+        pass
+
+    class LocalLanguage(Grammar[LocalBuilder, Node]):
+        A = Terminal(pattern=r"a")
+        S = NonTerminal()
+
+        @classmethod
+        def builder(cls) -> type[LocalBuilder]:
+            return LocalBuilder
+
+        @classmethod
+        def start(cls) -> NonTerminal:
+            return cls.S
+
+        @classmethod
+        def rules(cls) -> list[Rule]:
+            return [Rule(callback=cls.builder().noop, lhs=cls.S, rhs=[cls.A])]
+
+    with pytest.raises(ValueError, match="Cannot reference"):
+        LocalLanguage.generate_module(tmp_path / "local.py")
@@ -1,11 +1,27 @@
 from __future__ import annotations
 
+import gc
+import sys
+import time
+import pickle
+import subprocess
+import asyncio
+import threading
+import weakref
 import numpy as np
+import pytest
 
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Iterator
 from unittest.mock import patch
 
 from jizzy.builder import Builder
-from jizzy.grammar import Grammar, Repeat, Rule, Terminal, NonTerminal, Token, Node
+from jizzy.cache import fingerprint
+from jizzy.common import ParseError, Source
+from jizzy.grammar import Grammar, GrammarMeta, Repeat, Rule, Terminal, NonTerminal, Token, Node
+from jizzy.jizz.parser import Jizz
+from jizzy.json.parser import StrictJson
+from jizzy.lexer import LexerKind
 
 
 class TestBuilder(Builder):
@@ -86,6 +102,10 @@ def test_inheritance():
         def rules(cls) -> list[Rule]:
             return super().rules()
 
+    # Nonterminals compare their rules, which are filled in on first use
+    InheritedLanguage.finalize()
+    TestLanguage.finalize()
+
     assert InheritedLanguage.A == TestLanguage.A
     assert InheritedLanguage.B == TestLanguage.B
     assert InheritedLanguage.C == TestLanguage.C
@@ -162,3 +182,355 @@ def test_parse_calls():
 
     first_rule.assert_called_once()
     second_rule.assert_called_once()
+
+
+def test_tables_cached():
+    class CachedLanguage(TestLanguage):
+        pass
+
+    with patch.object(
+        CachedLanguage,
+        CachedLanguage.lalr_make_automaton.__name__,
+        wraps=CachedLanguage.lalr_make_automaton
+    ) as make_automaton:
+        CachedLanguage.warm()
+        CachedLanguage.parse("(a)")
+        CachedLanguage.parse("((a))")
+
+    make_automaton.assert_called_once()
+
+    tables = CachedLanguage.tables()
+    assert tables is CachedLanguage.tables()
+    assert tables is not TestLanguage.tables()
+    assert np.all(tables.automaton == TestLanguage.lalr_make_automaton())
+
+
+def test_parse_from_threads():
+    class ThreadedJson(StrictJson):
+        @classmethod
+        def contextual_lexing(cls) -> bool:
+            return True
+
+    make_tables = ThreadedJson.make_tables
+
+    def slow_make_tables():
+        # Leaves every thread time to arrive while the first one builds
+        time.sleep(0.05)
+        return make_tables()
+
+    texts = [
+        f"{{\"id\": {idx}, \"values\": [{', '.join(map(str, range(idx % 7)))}], \"ok\": true}}"
+        for idx in range(64)
+    ]
+    expected = [StrictJson.parse(text).to_python() for text in texts]
+
+    threads = 16
+    barrier = threading.Barrier(threads)
+
+    def parse_all(offset: int) -> list[object]:
+        barrier.wait()
+        return [
+            ThreadedJson.parse(texts[(offset + idx) % len(texts)]).to_python()
+            for idx in range(len(texts) * 4)
+        ]
+
+    with (
+        patch.object(ThreadedJson, "make_tables", wraps=slow_make_tables) as built,
+        ThreadPoolExecutor(threads) as executor
+    ):
+        results = list(executor.map(parse_all, range(threads)))
+
+    built.assert_called_once()
+    for offset, values in enumerate(results):
+        assert values == [expected[(offset + idx) % len(texts)] for idx in range(len(texts) * 4)]
+
+    assert ThreadedJson.tables().automaton.flags.writeable is False
+
+
+def test_lazy_finalization():
+    class LazyLanguage(TestLanguage):
+        pass
+
+    assert not LazyLanguage._finalized
+    assert LazyLanguage.A is not TestLanguage.A
+    assert LazyLanguage.A.idx == TestLanguage.A.idx
+    assert not LazyLanguage.D.rules
+
+    assert LazyLanguage.parse("(a)") == TestLanguage.parse("(a)")
+    assert LazyLanguage._finalized
+    assert LazyLanguage.D.rules
+
+
+def test_memory_report():
+    class ReportedLanguage(TestLanguage):
+        @classmethod
+        def cache_dir(cls):
+            return None
+
+    ReportedLanguage.first_sets()
+    report = ReportedLanguage.memory_report()
+    assert report["rules"] > 0
+    assert report["build"] > 0
+    assert report["tables"] == report["scanners"] == 0
+
+    ReportedLanguage.warm()
+    report = ReportedLanguage.memory_report()
+    assert report["tables"] > 0
+    assert report["scanners"] > 0
+    assert report["build"] == 0
+
+    # Computed again when asked for
+    assert ReportedLanguage.first(ReportedLanguage.D) == (
+        (1 << ReportedLanguage.A.idx) | (1 << ReportedLanguage.C.idx)
+    )
+
+
+def test_memory_report_side_effects():
+    class UnbuiltLanguage(TestLanguage):
+        pass
+
+    report = UnbuiltLanguage.memory_report()
+    assert not UnbuiltLanguage._finalized
+    assert UnbuiltLanguage._rules is None
+    assert report["rules"] > 0
+    assert report["tables"] == report["scanners"] == report["build"] == 0
+
+
+def test_grammars_released():
+    def make_grammar() -> weakref.ref[GrammarMeta]:
+        class ReleasedLanguage(TestLanguage):
+            pass
+
+        ReleasedLanguage.warm()
+        return weakref.ref(ReleasedLanguage)
+
+    released = make_grammar()
+    gc.collect()
+    assert released() is None
+
+
+def import_times(module: str) -> dict[str, int]:
+    # Cumulative microseconds per module imported by a fresh interpreter
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    times: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_import_time():
+    times = import_times("jizzy.jizz.parser, jizzy.json.parser")
+    assert "jizzy.jizz.parser" in times
+
+    # Only needed by parse_async() and parse_many()
+    for module in ("asyncio", "concurrent.futures", "multiprocessing"):
+        assert module not in times
+
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "from jizzy.jizz.parser import Jizz; "
+            "from jizzy.json.parser import StrictJson, LenientJson; "
+            "print(Jizz._finalized, StrictJson._finalized, LenientJson._finalized)"
+        ],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    assert result.stdout.split() == ["False", "False", "False"]
+
+
+def test_tables_disk_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("JIZZY_CACHE_DIR", str(tmp_path))
+
+    class FirstLanguage(TestLanguage):
+        pass
+
+    class SecondLanguage(TestLanguage):
+        pass
+
+    FirstLanguage.warm()
+    assert fingerprint(FirstLanguage) == fingerprint(SecondLanguage)
+
+    with patch.object(
+        SecondLanguage,
+        SecondLanguage.lalr_make_automaton.__name__
+    ) as make_automaton:
+        SecondLanguage.warm()
+
+    make_automaton.assert_not_called()
+    assert np.all(
+        SecondLanguage.tables().automaton ==
+        FirstLanguage.tables().automaton
+    )
+    assert SecondLanguage.parse("(a)") == FirstLanguage.parse("(a)")
+
+    class ChangedLanguage(TestLanguage):
+        E = Terminal(pattern=r"!")
+
+    assert fingerprint(ChangedLanguage) != fingerprint(FirstLanguage)
+
+
+def test_streaming_tokens():
+    tokens = TestLanguage.iter_tokens("(a)")
+
+    assert next(tokens) == Token(start=0, stop=1, text="(", type=TestLanguage.A)
+    assert next(tokens) == Token(start=1, stop=2, text="a", type=TestLanguage.C)
+
+    consumed: list[Token] = []
+
+    def iter_tokens(text: str) -> Iterator[Token]:
+        for token in TestLanguage.iter_tokens(text):
+            consumed.append(token)
+            yield token
+
+    class StreamingLanguage(TestLanguage):
+        pass
+
+    with (
+        patch.object(StreamingLanguage, "iter_tokens", iter_tokens),
+        pytest.raises(ParseError)
+    ):
+        StreamingLanguage.parse("(a))" + "(a)" * 1000)
+
+    assert len(consumed) == 4
+
+
+def test_lazy_token_text():
+    text = "((abc))"
+    tokens = TestLanguage.tokenize(text)
+
+    assert all("text" not in token.__dict__ for token in tokens)
+    assert all(token.source is text for token in tokens)
+
+    token = tokens[2]
+    assert token == Token(start=2, stop=5, text="abc", type=TestLanguage.C)
+    assert token.text == "abc"
+    assert "text" in token.__dict__
+    assert repr(token) == repr(Token(start=2, stop=5, text="abc", type=TestLanguage.C))
+
+    restored = pickle.loads(pickle.dumps(tokens[0]))
+    assert restored == tokens[0]
+    assert restored.source == ""
+    assert restored.text == "("
+
+
+def feed_chunks(grammar: GrammarMeta, text: Source, size: int) -> Node:
+    parser = grammar.parser()
+    for start in range(0, len(text), size):
+        parser.feed(text[start:start + size])
+    return parser.finish()
+
+
+@pytest.mark.parametrize("kind", ["dfa", "regex"])
+@pytest.mark.parametrize("contextual", [False, True])
+def test_push_parser(kind: LexerKind, contextual: bool):
+    class PushJizz(Jizz):
+        @classmethod
+        def lexer(cls) -> LexerKind:
+            return kind
+
+        @classmethod
+        def contextual_lexing(cls) -> bool:
+            return contextual
+
+    class PushJson(StrictJson):
+        @classmethod
+        def lexer(cls) -> LexerKind:
+            return kind
+
+        @classmethod
+        def contextual_lexing(cls) -> bool:
+            return contextual
+
+    # The regex lexer takes the first alternative, "<=" would lex as "<"
+    # and u8"..." as an identifier
+    jizz = "x = a + b * c;"
+    if kind == "dfa":
+        jizz += " f = 1.5f32; x = a <= b; y <<= ++z; s = u8\"a b\";"
+    json = "{\"naïve\": [1.5e+3, true, null, {\"b\": \"日本\"}],\n \"c\": 12}"
+    for size in (1, 2, 3, 7, 1000):
+        assert feed_chunks(PushJizz, jizz, size) == Jizz.parse(jizz)
+        assert feed_chunks(PushJson, json, size) == StrictJson.parse(json)
+        assert feed_chunks(PushJson, json.encode(), size) == StrictJson.parse(json.encode())
+
+    # A token spread over many chunks is not munched again from its start
+    # for every chunk that extends it
+    long = "{\"a\": \"" + "x" * 10000 + "\"}"
+    scanner = type(PushJson.scanner())
+    with patch.object(scanner, "munch", autospec=True, side_effect=scanner.munch) as munch:
+        assert feed_chunks(PushJson, long, 10) == StrictJson.parse(long)
+        assert feed_chunks(PushJson, long.encode(), 10) == StrictJson.parse(long.encode())
+    assert munch.call_count < 60
+
+    parser = PushJson.parser()
+    parser.feed("{\"a\": ")
+    with pytest.raises(TypeError, match="Cannot feed a bytes-like chunk to a parser fed str chunks"):
+        parser.feed(b"1}")
+
+    parser = PushJson.parser()
+    parser.feed("{\"a\": ")
+    parser.feed("[1, ")
+    with pytest.raises(ParseError, match="Unexpected character: '@' at position 11"):
+        parser.feed("2@]}")
+
+    parser = PushJson.parser()
+    parser.feed("{\"a\": 1")
+    with pytest.raises(ParseError, match="\\(_EOF\\)"):
+        parser.finish()
+
+    parser = PushJson.parser()
+    parser.feed("{}")
+    assert parser.finish().to_python() == {}
+    with pytest.raises(ParseError, match="finished"):
+        parser.feed("{}")
+
+
+def test_parse_async():
+    json = "{\"items\": [" + ", ".join(f"{{\"k{idx}\": [{idx}, true]}}" for idx in range(500)) + "]}"
+
+    async def chunks(size: int, stop: int = len(json)) -> AsyncIterator[str]:
+        for start in range(0, stop, size):
+            yield json[start:min(start + size, stop)]
+
+    async def from_reader() -> Node:
+        reader = asyncio.StreamReader()
+        reader.feed_data(json.encode())
+        reader.feed_eof()
+        return await StrictJson.parse_async(reader, chunk_size=100)
+
+    async def interleaved() -> tuple[Node, int]:
+        # A single large chunk must still let other coroutines run
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        task = asyncio.create_task(ticker())
+        result = await StrictJson.parse_async(chunks(len(json)), tokens_per_step=100)
+        task.cancel()
+        return result, ticks
+
+    expected = StrictJson.parse(json)
+    assert asyncio.run(StrictJson.parse_async(chunks(7))) == expected
+    assert asyncio.run(from_reader()) == StrictJson.parse(json.encode())
+
+    result, ticks = asyncio.run(interleaved())
+    assert result == expected
+    assert ticks > 20
+
+    with pytest.raises(ParseError, match="\\(_EOF\\)"):
+        asyncio.run(StrictJson.parse_async(chunks(7, len(json) - 1)))
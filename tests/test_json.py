@@ -1,8 +1,13 @@
 from __future__ import annotations
 
 import pytest
+import multiprocessing
 
-from jizzy.grammar import ParseError
+from operator import methodcaller
+from pathlib import Path
+
+from jizzy.common import ParseError
+from jizzy.lexer import LexerKind
 from jizzy.json.parser import StrictJson, LenientJson
 from jizzy.json.builder import Object, Array, DictBody, ListBody
 
@@ -49,3 +54,97 @@ def test_strict_json():
 
     with pytest.raises(ParseError, match=r"Unexpected token: 'true' \(BOOLEAN\)"):
         StrictJson.parse("true")
+
+
+@pytest.mark.parametrize("kind", ["dfa", "regex"])
+def test_bytes_input(kind: LexerKind, tmp_path: Path):
+    class BytesJson(StrictJson):
+        @classmethod
+        def lexer(cls) -> LexerKind:
+            return kind
+
+    text = "{\"naïve\": [1, 2.5e+3, \"日本\", {\"b\": null}]}"
+    data = text.encode()
+    expected = StrictJson.parse(text).to_python()
+
+    assert BytesJson.parse(data).to_python() == expected
+    assert BytesJson.parse(memoryview(data)).to_python() == expected
+    assert BytesJson.parse(bytearray(data)).to_python() == expected
+
+    tokens = BytesJson.tokenize(data)
+    assert [token.text for token in tokens] == [token.text for token in StrictJson.tokenize(text)]
+    assert tokens[1].stop == 1 + len("\"naïve\"".encode())
+
+    path = tmp_path / "data.json"
+    path.write_bytes(data)
+    assert BytesJson.parse_file(path).to_python() == expected
+
+    with pytest.raises(ParseError, match="Unexpected character: b'@' at position 6"):
+        BytesJson.parse(b"{\"a\": @}")
+
+    (tmp_path / "empty.json").write_bytes(b"")
+    with pytest.raises(ParseError):
+        BytesJson.parse_file(tmp_path / "empty.json")
+
+
+@pytest.mark.parametrize("contextual", [False, True])
+def test_iter_documents(contextual: bool, tmp_path: Path):
+    class LinesJson(LenientJson):
+        @classmethod
+        def contextual_lexing(cls) -> bool:
+            return contextual
+
+    lines = [
+        "{\"a\": 1, \"b\": [true, null]}",
+        "[1, 2.5e+3]",
+        "\"naïve\"",
+        "12",
+        "{}",
+    ]
+    expected = [LenientJson.parse(line).to_python() for line in lines]
+
+    text = "\n".join(lines) + "\n"
+    assert [value.to_python() for value in LinesJson.iter_documents(text)] == expected
+    assert [value.to_python() for value in LinesJson.iter_documents(text.splitlines())] == expected
+    assert [value.to_python() for value in LinesJson.iter_documents("{}[]12 null")] == [{}, [], 12, None]
+    assert list(LinesJson.iter_documents(" \n")) == []
+
+    path = tmp_path / "data.jsonl"
+    path.write_text(text, encoding="utf-8")
+    with open(path, "rb") as file:
+        assert [value.to_python() for value in LinesJson.iter_documents(file, chunk_size=5)] == expected
+    with open(path, encoding="utf-8") as file:
+        assert [value.to_python() for value in LinesJson.iter_documents(file)] == expected
+
+    values = LinesJson.iter_documents("{\"a\": 1}\n{\"a\": ]}")
+    assert next(values).to_python() == {"a": 1}
+    with pytest.raises(ParseError, match=r"Unexpected token: '\]' \(CB\)"):
+        next(values)
+
+    with pytest.raises(ParseError, match=r"\(_EOF\)"):
+        list(LinesJson.iter_documents("{} [1, "))
+
+    # Documents keep their positions in the whole input
+    first, second = LinesJson.iter_documents("[1]  [2]")
+    assert (first.start, first.stop) == (0, 3)
+    assert (second.start, second.stop) == (5, 8)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_parse_many(workers: int):
+    texts = [f"{{\"id\": {idx}, \"tags\": [{'\"a\", ' * (idx % 3)}null]}}" for idx in range(200)]
+    expected = [StrictJson.parse(text).to_python() for text in texts]
+
+    to_python = methodcaller("to_python")
+    assert list(StrictJson.parse_many(texts, workers=workers, transform=to_python, batch_size=500)) == expected
+    assert list(StrictJson.parse_many(iter(texts[:5]), workers=workers)) == [StrictJson.parse(text) for text in texts[:5]]
+    assert list(LenientJson.parse_many([b"[1]", "2"], workers=workers, transform=to_python)) == [[1], 2]
+    assert list(LenientJson.parse_many([memoryview(b"[1]"), bytearray(b"{}")], workers=workers, transform=to_python)) == [[1], {}]
+
+    spawned = StrictJson.parse_many(texts[:5], workers=workers, transform=to_python, mp_context=multiprocessing.get_context("spawn"))
+    assert list(spawned) == expected[:5]
+
+    values = StrictJson.parse_many(["{}", "{\"a\": }"], workers=workers, batch_size=1)
+    assert next(values) == StrictJson.parse("{}")
+    with pytest.raises(ParseError, match=r"Unexpected token: '\}' \(CC\)"):
+        next(values)
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from jizzy.builder import Builder
+from jizzy.common import Node
+from jizzy.grammar import Grammar, GrammarMeta, NonTerminal, Rule, Terminal
+from jizzy.helpers import bits
+from jizzy.jizz.parser import Jizz
+from jizzy.json.parser import StrictJson, LenientJson
+
+
+@pytest.mark.parametrize("grammar", [StrictJson, LenientJson, Jizz])
+def test_engines_agree(grammar: GrammarMeta):
+    iterative = grammar.lalr_make_automaton("iterative")
+    relations = grammar.lalr_make_automaton("deremer-pennello")
+
+    assert iterative.shape == relations.shape
+    assert np.array_equal(iterative, relations)
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError, match="Unknown LALR engine"):
+        StrictJson.lalr_make_automaton("canonical")  # type: ignore
+
+
+def test_jizz_parse():
+    result = Jizz.parse("a = b + c; f(x)[1]{y}")
+
+    assert len(result.items) == 2
+    assert str(result.items[0]) == "a = b + c;"
+
+
+def test_lookahead_bitsets():
+    assert list(bits(0)) == []
+    assert list(bits(0b101001)) == [0, 3, 5]
+
+    assert StrictJson.first(StrictJson.OC) == 1 << StrictJson.OC.idx
+    assert StrictJson.first(StrictJson.VALUE) == sum(
+        1 << terminal.idx
+        for terminal in [
+            StrictJson.OC,
+            StrictJson.OB,
+            StrictJson.NUMBER,
+            StrictJson.STRING,
+            StrictJson.BOOLEAN,
+            StrictJson.NULL
+        ]
+    )
+
+
+class NullableBuilder(Builder):
+    def node(self, start: int, stop: int):
+        return Node(start=start, stop=stop)
+
+
+class NullableLanguage(Grammar[NullableBuilder, Node]):
+    A = Terminal(pattern=r"a")
+    B = Terminal(pattern=r"b")
+    X = Terminal(pattern=r"x")
+
+    S = NonTerminal()
+    OPTIONAL_A = NonTerminal()
+    OPTIONAL_B = NonTerminal()
+    PREFIX = NonTerminal()
+
+    @classmethod
+    def builder(cls):
+        return NullableBuilder
+
+    @classmethod
+    def start(cls):
+        return cls.S
+
+    @classmethod
+    def rules(cls):
+        builder = cls.builder()
+        return [
+            Rule(callback=builder.node, lhs=cls.S, rhs=[cls.PREFIX, cls.X]),
+            Rule(callback=builder.node, lhs=cls.PREFIX, rhs=[cls.OPTIONAL_A, cls.OPTIONAL_B]),
+            Rule(callback=builder.node, lhs=cls.OPTIONAL_A, rhs=[]),
+            Rule(callback=builder.node, lhs=cls.OPTIONAL_A, rhs=[cls.A]),
+            Rule(callback=builder.node, lhs=cls.OPTIONAL_B, rhs=[]),
+            Rule(callback=builder.node, lhs=cls.OPTIONAL_B, rhs=[cls.B]),
+        ]
+
+
+def test_nullable():
+    language = NullableLanguage
+    language.finalize()
+
+    assert language.OPTIONAL_A.nullable
+    assert language.OPTIONAL_B.nullable
+    # Nullable through a rule of nullable nonterminals only
+    assert language.PREFIX.nullable
+    assert not language.S.nullable
+
+    assert language.first(language.PREFIX) == (1 << language.A.idx) | (1 << language.B.idx)
+    assert language.first(language.S) == sum(
+        1 << terminal.idx
+        for terminal in [language.A, language.B, language.X]
+    )
+
+    assert np.array_equal(
+        language.lalr_make_automaton("iterative"),
+        language.lalr_make_automaton("deremer-pennello")
+    )
+    for text in ["x", "ax", "bx", "abx"]:
+        assert language.parse(text) == Node(start=0, stop=len(text))
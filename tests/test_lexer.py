@@ -0,0 +1,319 @@
+from __future__ import annotations
+
+import regex
+import random
+import asyncio
+import pytest
+
+from typing import AsyncIterator
+
+from jizzy.builder import Builder
+from jizzy.dfa import Dfa, UnsupportedPattern
+from jizzy.common import ParseError
+from jizzy.grammar import Grammar, Rule, Terminal, NonTerminal, Node, Token
+from jizzy.lexer import DfaScanner, LexerKind, RegexScanner, TokenBuffer
+from jizzy.jizz.parser import Jizz
+from jizzy.json.parser import StrictJson
+
+
+def test_scanner_cached():
+    assert StrictJson.scanner() is StrictJson.scanner()
+    assert Jizz.scanner() is not StrictJson.scanner()
+
+
+def test_scanner_groups():
+    tokens = StrictJson.tokenize("{\"a\": [1.5e+3, true, null]}")
+
+    assert [token.type for token in tokens] == [
+        StrictJson.OC,
+        StrictJson.STRING,
+        StrictJson.COLON,
+        StrictJson.OB,
+        StrictJson.NUMBER,
+        StrictJson.COMMA,
+        StrictJson.BOOLEAN,
+        StrictJson.COMMA,
+        StrictJson.NULL,
+        StrictJson.CB,
+        StrictJson.CC
+    ]
+    assert tokens[4].text == "1.5e+3"
+
+
+def test_dfa_longest_match():
+    assert isinstance(Jizz.scanner(), DfaScanner)
+
+    tokens = Jizz.tokenize("iffy if x <= y <<= ++z <=> w")
+
+    assert [token.type for token in tokens] == [
+        Jizz.IDENTIFIER,
+        Jizz.IF,
+        Jizz.IDENTIFIER,
+        Jizz.CMP_LE,
+        Jizz.IDENTIFIER,
+        Jizz.ASS_SHL,
+        Jizz.INC,
+        Jizz.IDENTIFIER,
+        Jizz.CMP_IE,
+        Jizz.IDENTIFIER
+    ]
+
+
+@pytest.mark.parametrize(
+    "pattern",
+    [
+        *(
+            terminal.pattern
+            for terminal in [*StrictJson.terminals(), *Jizz.terminals()]
+            if terminal.pattern is not None
+        ),
+        r"a{2,3}b?",
+        r"(ab|a)*c",
+        r"[^\d\s]+",
+        r"[]a-]\x41",
+        r"é+\w"
+    ]
+)
+def test_dfa_matches_regex(pattern: str):
+    dfa = Dfa.from_patterns([pattern])
+    compiled = regex.compile(pattern, flags=regex.VERSION1)
+
+    alphabet = "abcefiu0123689 \n\"'\\.-+eE{}<=>é٣Ω\u0301‿Ⓐ\u200d²\u3000"
+    generator = random.Random(pattern)
+    for _ in range(500):
+        text = "".join(
+            generator.choice(alphabet)
+            for _ in range(generator.randrange(10))
+        )
+        longest = max(
+            (
+                stop
+                for stop in range(1, len(text) + 1)
+                if compiled.fullmatch(text, 0, stop)
+            ),
+            default=None
+        )
+
+        accepted, stop = dfa.longest_match(text)
+        if longest is None:
+            assert accepted == -1
+        else:
+            assert accepted == 0
+            assert stop == longest
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "cafe\u0301 = x",
+        "snake‿case = Ⓐ٣",
+        "x\u200dy = x + ４２",
+        "naïve\u3000= 日本"
+    ]
+)
+def test_dfa_unicode_identifiers(text: str):
+    # Non-ASCII word, digit and space characters are the ones regex
+    # matches with \w, \d and \s, combining marks and connectors included
+    class RegexJizz(Jizz):
+        @classmethod
+        def lexer(cls) -> LexerKind:
+            return "regex"
+
+    assert isinstance(Jizz.scanner(), DfaScanner)
+    assert Jizz.tokenize(text) == RegexJizz.tokenize(text)
+
+
+def test_dfa_fallback():
+    class LookaheadLanguage(Grammar[Builder, Node]):
+        A = Terminal(pattern=r"a(?=b)")
+        B = Terminal(pattern=r"b")
+        S = NonTerminal()
+
+        @classmethod
+        def builder(cls) -> type[Builder]:
+            return Builder
+
+        @classmethod
+        def start(cls) -> NonTerminal:
+            return cls.S
+
+        @classmethod
+        def rules(cls) -> list[Rule]:
+            return [Rule(callback=cls.builder().noop, lhs=cls.S, rhs=[cls.A, cls.B])]
+
+    assert isinstance(LookaheadLanguage.scanner(), RegexScanner)
+    LookaheadLanguage.parse("ab")
+
+    with pytest.raises(UnsupportedPattern):
+        Dfa.from_patterns([r"^a"])
+
+    class RegexJson(StrictJson):
+        @classmethod
+        def lexer(cls) -> LexerKind:
+            return "regex"
+
+    text = "{\"a\": [1.5e+3, true, null]}"
+    assert isinstance(RegexJson.scanner(), RegexScanner)
+    assert RegexJson.tokenize(text) == StrictJson.tokenize(text)
+
+    # One pattern the DFA cannot take leaves every other terminal lexing
+    # the same, the fallback takes the longest match as the DFA does
+    class LabelJizz(Jizz):
+        LABEL = Terminal(pattern=r"\w+:(?!:)")
+
+    text = "iffy if x <= y <<= ++z <=> w"
+    assert isinstance(LabelJizz.scanner(), RegexScanner)
+    assert [token.type.name for token in LabelJizz.tokenize(text)] == [
+        token.type.name for token in Jizz.tokenize(text)
+    ]
+    assert [token.type.name for token in LabelJizz.tokenize("done: x")] == [
+        "LABEL", "IDENTIFIER"
+    ]
+
+
+class KeywordBuilder(Builder):
+    pass
+
+
+class KeywordLanguage(Grammar[KeywordBuilder, Node]):
+    KEY = Terminal(pattern=r"key")
+    EQ = Terminal(pattern=r"=")
+    NAME = Terminal(pattern=r"\w+")
+    SPACE = Terminal(pattern=r" +", skip=True)
+
+    S = NonTerminal()
+
+    @classmethod
+    def builder(cls) -> type[KeywordBuilder]:
+        return KeywordBuilder
+
+    @classmethod
+    def start(cls) -> NonTerminal:
+        return cls.S
+
+    @classmethod
+    def rules(cls) -> list[Rule]:
+        return [
+            Rule(
+                callback=cls.builder().noop,
+                lhs=cls.S,
+                rhs=[cls.KEY, cls.NAME, cls.EQ, cls.NAME]
+            )
+        ]
+
+    @classmethod
+    def contextual_lexing(cls) -> bool:
+        return True
+
+
+@pytest.mark.parametrize("kind", ["dfa", "regex"])
+def test_contextual_lexing(kind: LexerKind):
+    class ContextualKeywords(KeywordLanguage):
+        @classmethod
+        def lexer(cls) -> LexerKind:
+            return kind
+
+    class ContextualJson(StrictJson):
+        @classmethod
+        def lexer(cls) -> LexerKind:
+            return kind
+
+        @classmethod
+        def contextual_lexing(cls) -> bool:
+            return True
+
+    ContextualKeywords.parse("key key = key")
+    ContextualKeywords.parse("key keys = k")
+    with pytest.raises(ParseError, match="'=' \\(EQ\\)"):
+        ContextualKeywords.parse("key = key")
+
+    text = "{\"a\": [1.5e+3, true, null, {\"b\": []}]}"
+    assert ContextualJson.parse(text) == StrictJson.parse(text)
+
+    with pytest.raises(ParseError, match="Unexpected token: '2'"):
+        ContextualJson.parse("{\"a\": [1 2]}")
+
+
+@pytest.mark.parametrize("size", [1, 2, 4096])
+def test_contextual_steps(size: int):
+    # Every token is scanned in the state left by the ones before it,
+    # also when tokens are parsed a few at a time
+    text = "key key = key"
+
+    parser = KeywordLanguage.parser()
+    for _ in parser.feed_steps(text, size):
+        pass
+    for _ in parser.finish_steps(size):
+        pass
+    assert parser.finished
+
+    async def chunks() -> AsyncIterator[str]:
+        yield text
+
+    asyncio.run(KeywordLanguage.parse_async(chunks(), tokens_per_step=size))
+
+
+@pytest.mark.parametrize("kind", ["dfa", "regex"])
+def test_skip_terminals(kind: LexerKind):
+    class SkippingJson(StrictJson):
+        @classmethod
+        def lexer(cls) -> LexerKind:
+            return kind
+
+    class ContextualJson(SkippingJson):
+        @classmethod
+        def contextual_lexing(cls) -> bool:
+            return True
+
+    text = "{\n  \"a\" : [ 1 ,\t2 ]\n}\n"
+    assert [token.text for token in SkippingJson.tokenize(text)] == [
+        "{", "\"a\"", ":", "[", "1", ",", "2", "]", "}"
+    ]
+    assert ContextualJson.parse(text) == StrictJson.parse(text)
+
+    for grammar in (SkippingJson, ContextualJson):
+        with pytest.raises(ParseError, match="Unexpected character: '@' at position 7"):
+            grammar.parse("{\"a\": [@]}")
+        with pytest.raises(ParseError, match="Unexpected character: '~' at position 2"):
+            grammar.parse("{}~")
+
+
+@pytest.mark.parametrize("kind", ["dfa", "regex"])
+def test_bytes_ascii_semantics(kind: LexerKind):
+    class BytesJizz(Jizz):
+        @classmethod
+        def lexer(cls) -> LexerKind:
+            return kind
+
+    # \w matches é in str input only, bytes are scanned bytewise
+    text = "é = b;"
+    assert BytesJizz.parse(text) == Jizz.parse(text)
+    with pytest.raises(ParseError, match=r"Unexpected character: b'\\xc3' at position 0"):
+        BytesJizz.parse(text.encode())
+
+
+def test_token_buffer():
+    text = "{\"a\": [1.5e+3, true, null, {\"b\": []}], \"c\": \"d\"}"
+    buffer = StrictJson.tokenize(text, compact=True)
+
+    assert isinstance(buffer, TokenBuffer)
+    assert len(buffer) == len(StrictJson.tokenize(text))
+    assert list(buffer) == StrictJson.tokenize(text)
+    assert buffer[1] == Token(start=1, stop=4, text="\"a\"", type=StrictJson.STRING)
+    assert buffer[-1].text == "}"
+    assert buffer.nbytes == len(buffer) * 18
+
+    assert StrictJson.parse_buffer(buffer) == StrictJson.parse(text)
+    assert StrictJson.parse_buffer(buffer).to_python() == {
+        "a": [1.5e+3, True, None, {"b": []}],
+        "c": "d"
+    }
+
+    with pytest.raises(ParseError) as buffer_error:
+        StrictJson.parse_buffer(StrictJson.tokenize("{\"a\" 1}", compact=True))
+    with pytest.raises(ParseError) as expected_error:
+        StrictJson.parse("{\"a\" 1}")
+    assert str(buffer_error.value) == str(expected_error.value)
+
+    with pytest.raises(ParseError, match="\\(_EOF\\)"):
+        StrictJson.parse_buffer(StrictJson.tokenize("{\"a\": 1", compact=True))
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from pathlib import Path
+
+from jizzy.cache import table_path
+from jizzy.grammar import GrammarMeta
+from jizzy.jizz.parser import Jizz
+from jizzy.json.parser import StrictJson, LenientJson
+from jizzy.tables import CompressedTable, TableLayout
+
+
+@pytest.mark.parametrize("grammar", [StrictJson, LenientJson, Jizz])
+def test_compressed_lookup(grammar: GrammarMeta):
+    automaton = grammar.tables().automaton
+    compressed = CompressedTable(automaton, len(grammar.terminals()))
+
+    terminal_count = len(grammar.terminals())
+    for state, row in enumerate(automaton.tolist()):
+        for symbol, action in enumerate(row):
+            if action != 0:
+                assert compressed[state][symbol] == action
+            elif symbol < terminal_count:
+                assert compressed[state][symbol] in (0, compressed.action_default[state])
+
+    assert compressed.nbytes < automaton.size * 2 // 3
+
+
+def test_dense_tables():
+    class DenseJizz(Jizz):
+        pass
+
+    tables = DenseJizz.tables()
+    assert isinstance(tables.rows, tuple)
+    assert np.array_equal(tables.automaton, Jizz.tables().automaton)
+
+    # The rows are the only copy kept, about one pointer per entry
+    automaton = tables.automaton
+    assert automaton is not None
+    assert DenseJizz.memory_report()["tables"] < automaton.size * 8 * 3 // 2
+
+
+def test_compressed_parse():
+    class CompressedJson(LenientJson):
+        @classmethod
+        def table_layout(cls) -> TableLayout:
+            return "compressed"
+
+    class CompressedJizz(Jizz):
+        @classmethod
+        def table_layout(cls) -> TableLayout:
+            return "compressed"
+
+    assert isinstance(CompressedJson.tables().rows, CompressedTable)
+
+    text = "[1, {\"a\": [true, null]}, \"b\", {}]"
+    assert CompressedJson.parse(text) == LenientJson.parse(text)
+
+    text = "a = b + c; f(x)[1]{y}"
+    assert str(CompressedJizz.parse(text)) == str(Jizz.parse(text))
+
+    # Only the compressed form is kept, the whole tables take less than
+    # the dense automaton would on its own
+    dense = Jizz.tables().automaton
+    assert CompressedJizz.tables().automaton is None
+    assert CompressedJizz.memory_report()["tables"] < dense.nbytes
+    assert np.array_equal(CompressedJizz.automaton(), dense)
+
+
+def test_shared_parse(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    class SharedJizz(Jizz):
+        @classmethod
+        def table_layout(cls) -> TableLayout:
+            return "shared"
+
+    text = "a = b + c; f(x)[1]{y}"
+    tables = SharedJizz.tables()
+    assert all(isinstance(row, memoryview) for row in tables.rows)
+    assert np.array_equal(tables.automaton, Jizz.tables().automaton)
+    assert not tables.automaton.flags.writeable
+    assert str(SharedJizz.parse(text)) == str(Jizz.parse(text))
+
+    monkeypatch.setenv("JIZZY_CACHE_DIR", str(tmp_path))
+
+    class MappedJson(LenientJson):
+        @classmethod
+        def table_layout(cls) -> TableLayout:
+            return "shared"
+
+    class RemappedJson(MappedJson):
+        pass
+
+    path = table_path(MappedJson, tmp_path)
+    assert not path.exists()
+
+    first = MappedJson.tables()
+    assert path.stat().st_size == first.automaton.nbytes
+    assert np.array_equal(first.automaton, LenientJson.tables().automaton)
+
+    # A stale file is replaced, the mapping itself is never written to.
+    # Unlinked first, truncating it would pull the pages from under first.
+    path.unlink()
+    path.write_bytes(b"\0" * 8)
+    second = RemappedJson.tables()
+    assert np.array_equal(second.automaton, first.automaton)
+    with pytest.raises(TypeError):
+        second.rows[0][0] = 1
+
+    text = "[1, {\"a\": [true, null]}, \"b\", {}]"
+    assert RemappedJson.parse(text) == LenientJson.parse(text)